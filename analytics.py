@@ -0,0 +1,99 @@
+# Summary: This module contains portfolio-wide analytics across all stocks at once.
+# Every stock's closes are aligned on one shared date axis (a dates x symbols matrix),
+# daily returns are computed once from it, and the equity curve, per-symbol contribution,
+# volatility and correlation/covariance matrices are all derived from those two matrices
+# with vectorized numpy/pandas operations.
+
+import warnings
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252 # used to annualize daily volatility
+
+
+# Aligned closes and returns for a list of stocks.
+# closes has one row per date in dates (day ordinals, the union of every stock's dates) and one
+# column per symbol; a stock without a bar on some date carries its last close forward, and is
+# NaN before its first bar. returns[i] is the change from row i to row i + 1 (NaN before a stock's
+# first bar). start and end (dates, inclusive) limit the analysis to part of the history.
+class PortfolioAnalytics:
+    def __init__(self, stock_list, start=None, end=None):
+        self.symbols = [stock.symbol for stock in stock_list]
+        self.shares = np.array([stock.shares for stock in stock_list], dtype="float64")
+        columns = []
+        for stock in stock_list:
+            bars = stock.window(start, end)
+            columns.append((np.array(bars.dates, dtype="int64"), np.array(bars.closes, dtype="float64")))
+        self.dates = np.unique(np.concatenate([dates for dates, _ in columns])) if columns else np.empty(0, "int64")
+        closes = np.full((len(self.dates), len(columns)), np.nan)
+        for column, (dates, values) in enumerate(columns):
+            closes[np.searchsorted(self.dates, dates), column] = values
+        self.closes = pd.DataFrame(closes).ffill().to_numpy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.returns = self.closes[1:] / self.closes[:-1] - 1.0
+
+    def __len__(self):
+        return len(self.dates)
+
+    # Market value (shares x close, summed over symbols) on each date; a stock adds nothing before its first bar
+    def equity_curve(self):
+        return np.nansum(self.closes * self.shares, axis=1)
+
+    # Profit/loss of each symbol over the period (shares x change from its first to its last close)
+    def contribution(self):
+        if not len(self):
+            return np.zeros(len(self.symbols))
+        first = pd.DataFrame(self.closes).bfill().to_numpy()[0]
+        return np.nan_to_num((self.closes[-1] - first) * self.shares)
+
+    # Annualized volatility (standard deviation of daily returns) per symbol
+    def volatility(self):
+        if not len(self.returns):
+            return np.full(len(self.symbols), np.nan)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning) # a symbol with no returns gives NaN
+            return np.nanstd(self.returns, axis=0) * np.sqrt(TRADING_DAYS)
+
+    # Daily return of the whole portfolio: the day's profit/loss over the previous day's value,
+    # counting only stocks that had a bar on both days (so a stock's first bar is not a gain)
+    def portfolio_returns(self):
+        held = self.closes * self.shares
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.nansum(held[1:] - held[:-1], axis=1) / np.nansum(held[:-1], axis=1)
+
+    # Annualized volatility of the portfolio's daily returns
+    def portfolio_volatility(self):
+        returns = self.portfolio_returns()
+        returns = returns[np.isfinite(returns)]
+        return float(np.std(returns) * np.sqrt(TRADING_DAYS)) if len(returns) else float("nan")
+
+    # Covariance and correlation of daily returns between symbols (symbols x symbols).
+    # Days before a stock's first bar count as no change, so every pair uses the same dates.
+    def covariance(self):
+        return np.cov(np.nan_to_num(self.returns), rowvar=False)
+
+    def correlation(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.corrcoef(np.nan_to_num(self.returns), rowvar=False)
+
+
+# Portfolio summary lines for the console report
+def report_lines(stock_list):
+    if not stock_list:
+        return []
+    analytics = PortfolioAnalytics(stock_list)
+    if not len(analytics):
+        return []
+    equity = analytics.equity_curve()
+    contribution = analytics.contribution()
+    first_date = datetime.fromordinal(int(analytics.dates[0])).strftime('%m/%d/%y')
+    last_date = datetime.fromordinal(int(analytics.dates[-1])).strftime('%m/%d/%y')
+    lines = [f"Value: ${equity[0]:,.2f} ({first_date}) -> ${equity[-1]:,.2f} ({last_date})",
+             f"Profit/Loss: ${contribution.sum():,.2f}  Volatility: {analytics.portfolio_volatility():.1%} annualized"]
+    order = np.argsort(contribution)
+    if len(order):
+        best, worst = order[-1], order[0]
+        lines.append(f"Best: {analytics.symbols[best]} ${contribution[best]:,.2f}  "
+                     f"Worst: {analytics.symbols[worst]} ${contribution[worst]:,.2f}")
+    return lines
@@ -0,0 +1,699 @@
+# Summary: This module contains timing and memory benchmarks for the stock analysis program.
+# Run it directly to execute every benchmark, or pass benchmark names to run a subset:
+#   python benchmarks.py price_series
+
+import csv
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from bs4 import BeautifulSoup
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from stock_class import Stock, DailyData, Portfolio
+import analytics
+import chart_export
+import charts
+import indicators
+import stock_data
+import stock_db
+import stock_report
+from stock_web_cache import PageCache
+
+
+# Print one result line in a common format
+def report(name, seconds, count=None, unit="rows", extra=""):
+    line = f"{name:<40} {seconds:8.3f}s"
+    if count and seconds:
+        line += f"  {count / seconds:>12,.0f} {unit}/s"
+    if extra:
+        line += f"  {extra}"
+    print(line)
+
+
+# Generate (date, close, volume) tuples for consecutive days
+def synthetic_bars(count, start=datetime(1990, 1, 1)):
+    close = 100.0
+    for day in range(count):
+        close = close * (1.0005 if day % 3 else 0.999)
+        yield start + timedelta(days=day), close, float(1_000_000 + day % 5000)
+
+
+# Measure elapsed time and peak traced memory of fn()
+def measure(fn):
+    tracemalloc.start()
+    begin = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - begin
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+# List of DailyData objects vs the columnar PriceSeries inside Stock
+def bench_price_series(count=1_000_000):
+    print(f"--- price series: {count:,} bars ---")
+    bars = list(synthetic_bars(count))
+
+    def build_list():
+        return [DailyData(date, close, volume) for date, close, volume in bars]
+
+    def build_series():
+        stock = Stock("BENCH", "Benchmark", 100)
+        for date, close, volume in bars:
+            stock.DataList.add(date.toordinal(), close, volume)
+        return stock.DataList
+
+    data_list, list_seconds, list_peak = measure(build_list)
+    report("build list[DailyData]", list_seconds, count, extra=f"peak {list_peak / 2**20:,.1f} MiB")
+    series, series_seconds, series_peak = measure(build_series)
+    report("build PriceSeries", series_seconds, count, extra=f"peak {series_peak / 2**20:,.1f} MiB")
+
+    begin = time.perf_counter()
+    total = sum(data.close for data in data_list)
+    report("scan closes list[DailyData]", time.perf_counter() - begin, count)
+    begin = time.perf_counter()
+    total = sum(series.closes)
+    report("scan closes PriceSeries", time.perf_counter() - begin, count)
+    begin = time.perf_counter()
+    total = sum(data.close for data in series)
+    report("iterate PriceSeries rows", time.perf_counter() - begin, count)
+    return total
+
+
+# Original add-then-resort pattern: append to a list of DailyData and re-sort the whole list after each entry
+def legacy_add_and_sort(data_list, daily_data):
+    data_list.append(daily_data)
+    data_list.sort(key=lambda data: data.date)
+
+
+# Entries added one at a time to a long history: the original append plus full re-sort
+# vs sorted insertion, for new days at the end and for back-filled or corrected older days
+def bench_add_data(history=20_000, entries=2_000):
+    print(f"--- add_data: {entries:,} entries into {history:,} bars ---")
+    bars = list(synthetic_bars(history + entries))
+    base, newer = bars[:history], bars[history:]
+    older = [bars[(i * 7919) % history] for i in range(entries)] # existing dates, scattered
+    for name, entry_bars in (("new days", newer), ("older days", older)):
+        data_list = [DailyData(date, close, volume) for date, close, volume in base]
+        begin = time.perf_counter()
+        for date, close, volume in entry_bars:
+            legacy_add_and_sort(data_list, DailyData(date, close, volume))
+        report(f"append + re-sort, {name}", time.perf_counter() - begin, entries, unit="entries",
+               extra=f"{len(data_list):,} bars")
+        stock = Stock("BENCH", "Benchmark", 100)
+        for date, close, volume in base:
+            stock.DataList.add(date.toordinal(), close, volume)
+        begin = time.perf_counter()
+        for date, close, volume in entry_bars:
+            stock.add_data(DailyData(date, close, volume))
+        report(f"sorted insert, {name}", time.perf_counter() - begin, entries, unit="entries",
+               extra=f"{len(stock.DataList):,} bars")
+
+
+# Profit/loss over date windows of a long history: filtering every bar vs Stock.window() by binary search
+def bench_window(bars=1_000_000, windows=10, span_days=90):
+    print(f"--- date windows: {windows} windows of {span_days} days over {bars:,} bars ---")
+    stock = Stock("BENCH", "Benchmark", 100)
+    for date, close, volume in synthetic_bars(bars):
+        stock.DataList.add(date.toordinal(), close, volume)
+    first = datetime.fromordinal(stock.DataList.dates[0])
+    starts = [first + timedelta(days=(i * 7919) % (bars - span_days)) for i in range(windows)]
+    begin = time.perf_counter()
+    for start in starts:
+        end = start + timedelta(days=span_days - 1)
+        closes = [data.close for data in stock.DataList if start <= data.date <= end]
+        profit_loss = (closes[-1] - closes[0]) * stock.shares
+    report("scan full history", time.perf_counter() - begin, windows, unit="windows")
+    begin = time.perf_counter()
+    for start in starts:
+        profit_loss = stock.profit_loss(start, start + timedelta(days=span_days - 1))
+    report("Stock.window() bisection", time.perf_counter() - begin, windows, unit="windows")
+    return profit_loss
+
+
+# Indicators over a long history: one vectorized pass, then new bars appended one at a time with the
+# indicators read after each, recomputing the whole history vs the cached incremental update
+def bench_indicators(bars=100_000, new_bars=200):
+    print(f"--- indicators: {bars:,} bars, then {new_bars} appended one at a time ---")
+    history = list(synthetic_bars(bars + new_bars))
+    stock = Stock("BENCH", "Benchmark", 100)
+    for date, close, volume in history[:bars]:
+        stock.DataList.add(date.toordinal(), close, volume)
+    begin = time.perf_counter()
+    indicators.indicators(stock)
+    report("vectorized full history", time.perf_counter() - begin, bars)
+    for name, refresh in (("full recompute per bar", lambda: indicators.Indicators(stock.DataList)),
+                          ("incremental per bar", lambda: indicators.indicators(stock))):
+        begin = time.perf_counter()
+        for date, close, volume in history[bars:]:
+            stock.add_data(DailyData(date, close, volume))
+            latest = refresh().latest()
+        report(name, time.perf_counter() - begin, new_bars, unit="bars")
+        stock.DataList.clear()
+        for date, close, volume in history[:bars]:
+            stock.DataList.add(date.toordinal(), close, volume)
+        indicators.indicators(stock)
+    return latest
+
+
+# Adding stocks one at a time and looking symbols up: a list re-sorted after each add and
+# scanned for each lookup vs Portfolio's sorted insert and dict index
+def bench_portfolio(symbol_count=5000, lookups=5000):
+    print(f"--- portfolio: {symbol_count:,} stocks, {lookups:,} lookups ---")
+    symbols = [f"S{(number * 7919) % symbol_count:05d}" for number in range(symbol_count)]
+    wanted = [symbols[(number * 104729) % symbol_count].lower() for number in range(lookups)]
+    stock_list = []
+    begin = time.perf_counter()
+    for symbol in symbols:
+        stock_list.append(Stock(symbol, symbol, 100))
+        stock_list.sort(key=lambda stock: stock.symbol.upper())
+    report("list append + sort", time.perf_counter() - begin, symbol_count, unit="stocks")
+    begin = time.perf_counter()
+    for symbol in wanted:
+        symbol = symbol.upper()
+        next((stock for stock in stock_list if stock.symbol.upper() == symbol), None)
+    report("list scan lookup", time.perf_counter() - begin, lookups, unit="lookups")
+    portfolio = Portfolio()
+    begin = time.perf_counter()
+    for symbol in symbols:
+        portfolio.append(Stock(symbol, symbol, 100))
+    report("Portfolio append", time.perf_counter() - begin, symbol_count, unit="stocks")
+    begin = time.perf_counter()
+    for symbol in wanted:
+        portfolio.get(symbol)
+    report("Portfolio lookup", time.perf_counter() - begin, lookups, unit="lookups")
+
+
+# Portfolio of symbol_count stocks holding bars_per_symbol consecutive daily bars each
+def synthetic_portfolio(symbol_count, bars_per_symbol):
+    stock_list = []
+    for number in range(symbol_count):
+        stock = Stock(f"S{number:04d}", f"Synthetic {number}", 100)
+        for date, close, volume in synthetic_bars(bars_per_symbol):
+            stock.DataList.add(date.toordinal(), close, volume)
+        stock_list.append(stock)
+    return stock_list
+
+
+# Original report calculations: sort the history, then rebuild close and volume lists per stock
+def legacy_report_stats(stock):
+    data_list = sorted(stock.DataList, key=lambda data: data.date)
+    closes = [data.close for data in data_list]
+    volumes = [data.volume for data in data_list]
+    profit_loss = (closes[-1] - closes[0]) * stock.shares
+    return min(closes), max(closes), sum(closes) / len(closes), sum(volumes), profit_loss
+
+
+# One report refresh over a portfolio: rescanning every history vs the running totals behind Stock.summary()
+def bench_summary(symbol_count=200, bars_per_symbol=5000):
+    print(f"--- report summary: {symbol_count} symbols x {bars_per_symbol:,} bars ---")
+    stock_list = synthetic_portfolio(symbol_count, bars_per_symbol)
+    begin = time.perf_counter()
+    for stock in stock_list:
+        legacy_report_stats(stock)
+    report("sort + rebuild lists per refresh", time.perf_counter() - begin, symbol_count, unit="symbols")
+    begin = time.perf_counter()
+    for stock in stock_list:
+        stock.summary()
+    report("Stock.summary() per refresh", time.perf_counter() - begin, symbol_count, unit="symbols")
+
+
+# Portfolio equity curve the per-symbol way: walk every stock's bars into a date -> value dict
+def legacy_equity_curve(stock_list):
+    equity = {}
+    for stock in stock_list:
+        for data in stock.DataList:
+            equity[data.date] = equity.get(data.date, 0.0) + data.close * stock.shares
+    return [equity[date] for date in sorted(equity)]
+
+
+# Aligned portfolio analytics over symbol_count stocks x years of daily bars
+def bench_analytics(symbol_count=1000, years=10):
+    bars_per_symbol = years * 252
+    print(f"--- portfolio analytics: {symbol_count} symbols x {bars_per_symbol:,} bars ---")
+    stock_list = synthetic_portfolio(symbol_count, bars_per_symbol)
+    begin = time.perf_counter()
+    legacy_equity_curve(stock_list)
+    report("equity curve, per-symbol dict walk", time.perf_counter() - begin, symbol_count * bars_per_symbol)
+    begin = time.perf_counter()
+    portfolio = analytics.PortfolioAnalytics(stock_list)
+    report("align closes + returns matrix", time.perf_counter() - begin, symbol_count * bars_per_symbol)
+    for name, compute in (("equity curve", portfolio.equity_curve), ("contribution", portfolio.contribution),
+                          ("volatility", portfolio.volatility), ("covariance", portfolio.covariance),
+                          ("correlation", portfolio.correlation)):
+        begin = time.perf_counter()
+        compute()
+        report(name, time.perf_counter() - begin)
+
+
+# Batch report over a saved portfolio: loading everything and rescanning each history vs
+# stock_report's workers summarizing one history at a time (in-process when workers is 1)
+def bench_report(symbol_count=1000, bars_per_symbol=2520):
+    print(f"--- batch report: {symbol_count} symbols x {bars_per_symbol:,} bars ---")
+    with scratch_database():
+        stock_data.save_stock_data(synthetic_portfolio(symbol_count, bars_per_symbol))
+        begin = time.perf_counter()
+        stock_list = []
+        stock_data.load_stock_data(stock_list)
+        for stock in stock_list:
+            legacy_report_stats(stock)
+        report("load all + rescan", time.perf_counter() - begin, symbol_count, unit="symbols")
+        del stock_list
+        for workers in sorted({1, os.cpu_count() or 1}):
+            with open(os.devnull, "w") as output:
+                timing = stock_report.generate_report(output, "csv", workers=workers)
+            report(f"generate_report, {timing['workers']} workers", timing["seconds"], symbol_count, unit="symbols")
+
+
+# Version 1 schema (mm/dd/yy TEXT dates) used by the original save and load code
+def create_legacy_database():
+    conn = sqlite3.connect("stocks.db")
+    conn.execute("CREATE TABLE stocks (symbol TEXT NOT NULL PRIMARY KEY, name TEXT, shares REAL);")
+    conn.execute("""CREATE TABLE dailyData (symbol TEXT NOT NULL, date TEXT NOT NULL, price REAL NOT NULL,
+                    volume REAL NOT NULL, PRIMARY KEY (symbol, date));""")
+    conn.close()
+
+
+# Run the body inside a scratch directory holding a fresh stocks.db
+@contextmanager
+def scratch_database(legacy=False):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        stock_db.configure(path=os.path.join(scratch, "stocks.db"))
+        try:
+            if legacy:
+                create_legacy_database()
+            else:
+                stock_data.create_database()
+            yield scratch
+        finally:
+            stock_db.configure(path="stocks.db")
+            os.chdir(cwd)
+
+
+# The original save loop: one INSERT and one COMMIT per row
+def legacy_save_stock_data(stock_list):
+    conn = sqlite3.connect("stocks.db")
+    cur = conn.cursor()
+    for stock in stock_list:
+        try:
+            cur.execute("INSERT INTO stocks (symbol, name, shares) VALUES (?, ?, ?);", (stock.symbol, stock.name, stock.shares))
+            cur.execute("COMMIT;")
+        except:
+            pass
+        for daily_data in stock.DataList:
+            try:
+                cur.execute("INSERT INTO dailyData (symbol, date, price, volume) VALUES (?, ?, ?, ?);",
+                            (stock.symbol, daily_data.date.strftime("%m/%d/%y"), daily_data.close, daily_data.volume))
+                cur.execute("COMMIT;")
+            except:
+                pass
+    conn.close()
+
+
+# Fill a version 1 database quickly (one transaction) to set up the legacy comparisons
+def legacy_save_rows(stock_list):
+    conn = sqlite3.connect("stocks.db")
+    with conn:
+        conn.executemany("INSERT INTO stocks (symbol, name, shares) VALUES (?, ?, ?);",
+                         ((stock.symbol, stock.name, stock.shares) for stock in stock_list))
+        conn.executemany("INSERT INTO dailyData (symbol, date, price, volume) VALUES (?, ?, ?, ?);",
+                         ((stock.symbol, daily_data.date.strftime("%m/%d/%y"), daily_data.close, daily_data.volume)
+                          for stock in stock_list for daily_data in stock.DataList))
+    conn.close()
+
+
+# Per-row commit save vs single-transaction executemany/UPSERT save
+# The per-row version is timed on a sample because it needs one fsync per row.
+def bench_save(symbol_count=200, bars_per_symbol=5000, legacy_rows=20_000):
+    rows = symbol_count * bars_per_symbol
+    print(f"--- save_stock_data: {symbol_count} symbols x {bars_per_symbol:,} bars = {rows:,} rows ---")
+    stock_list = synthetic_portfolio(symbol_count, bars_per_symbol)
+    sample = synthetic_portfolio(max(1, legacy_rows // bars_per_symbol), min(bars_per_symbol, legacy_rows))
+    sample_rows = sum(len(stock.DataList) for stock in sample)
+    with scratch_database(legacy=True):
+        begin = time.perf_counter()
+        legacy_save_stock_data(sample)
+        report(f"per-row commit ({sample_rows:,} row sample)", time.perf_counter() - begin, sample_rows)
+    with scratch_database():
+        begin = time.perf_counter()
+        stock_data.save_stock_data(stock_list)
+        report("bulk save (insert)", time.perf_counter() - begin, rows)
+        begin = time.perf_counter()
+        stock_data.save_stock_data(stock_list)
+        report("bulk save (upsert existing)", time.perf_counter() - begin, rows)
+
+
+# The original loader: one dailyData query and strptime per row for every stock, then a full re-sort
+def legacy_load_stock_data(stock_list):
+    stock_list.clear()
+    conn = sqlite3.connect("stocks.db")
+    for row in conn.execute("SELECT symbol, name, shares FROM stocks;").fetchall():
+        new_stock = Stock(row[0], row[1], row[2])
+        for dailyRow in conn.execute("SELECT date, price, volume FROM dailyData WHERE symbol=?;", (new_stock.symbol,)).fetchall():
+            new_stock.add_data(DailyData(datetime.strptime(dailyRow[0], "%m/%d/%y"), float(dailyRow[1]), float(dailyRow[2])))
+        stock_list.append(new_stock)
+    for stock in stock_list:
+        stock.DataList.sort()
+    conn.close()
+
+
+# Per-symbol loader vs single streaming ordered query
+def bench_load(symbol_count=1000, bars_per_symbol=1000):
+    rows = symbol_count * bars_per_symbol
+    print(f"--- load_stock_data: {symbol_count} symbols x {bars_per_symbol:,} bars = {rows:,} rows ---")
+    stock_list = synthetic_portfolio(symbol_count, bars_per_symbol)
+    loaded = []
+    with scratch_database(legacy=True):
+        legacy_save_rows(stock_list)
+        begin = time.perf_counter()
+        legacy_load_stock_data(loaded)
+        report("per-symbol queries + strptime + sort", time.perf_counter() - begin, rows)
+    with scratch_database():
+        stock_data.save_stock_data(stock_list)
+        begin = time.perf_counter()
+        stock_data.load_stock_data(loaded)
+        report("single ordered query", time.perf_counter() - begin, rows)
+
+
+# In-place upgrade of a version 1 database to the current schema
+def bench_migrate(symbol_count=1000, bars_per_symbol=1000):
+    rows = symbol_count * bars_per_symbol
+    print(f"--- migrate_database: {rows:,} rows ---")
+    with scratch_database(legacy=True):
+        legacy_save_rows(synthetic_portfolio(symbol_count, bars_per_symbol))
+        begin = time.perf_counter()
+        stock_data.migrate_database()
+        report("migrate version 1 -> current", time.perf_counter() - begin, rows)
+
+
+# One writer process: repeatedly save its own symbols plus a symbol shared by every writer
+def concurrent_writer(db_path, writer, rounds, symbol_count, bars_per_symbol):
+    stock_db.configure(path=db_path)
+    symbols = [f"W{writer}S{number}" for number in range(symbol_count)] + ["SHARED"]
+    stock_list = [Stock(symbol, f"Writer {writer}", writer) for symbol in symbols]
+    for stock in stock_list:
+        for date, close, volume in synthetic_bars(bars_per_symbol):
+            stock.DataList.add(date.toordinal(), close + writer, volume)
+    for _ in range(rounds):
+        stock_data.save_stock_data(stock_list)
+
+
+# Several processes saving into the same database at once; every save must succeed
+# and the final row counts must match what was written.
+def bench_concurrency(writers=6, rounds=10, symbol_count=5, bars_per_symbol=2000):
+    print(f"--- concurrent saves: {writers} writer processes x {rounds} saves ---")
+    with scratch_database() as scratch:
+        db_path = os.path.join(scratch, "stocks.db")
+        begin = time.perf_counter()
+        with multiprocessing.Pool(writers) as pool:
+            pool.starmap(concurrent_writer, [(db_path, writer, rounds, symbol_count, bars_per_symbol)
+                                             for writer in range(writers)])
+        elapsed = time.perf_counter() - begin
+        conn = stock_db.get_connection()
+        stock_count = conn.execute("SELECT COUNT(*) FROM stocks;").fetchone()[0]
+        row_count = conn.execute("SELECT COUNT(*) FROM dailyData;").fetchone()[0]
+        expected_stocks = writers * symbol_count + 1
+        expected_rows = expected_stocks * bars_per_symbol
+        written = writers * rounds * (symbol_count + 1) * bars_per_symbol
+        report("concurrent saves", elapsed, written, extra=f"stocks {stock_count}/{expected_stocks}  rows {row_count:,}/{expected_rows:,}")
+        if (stock_count, row_count) != (expected_stocks, expected_rows):
+            raise AssertionError("concurrent saves lost or duplicated rows")
+
+
+# HTML in the shape of a Yahoo! Finance history page: newest row first, with a dividend row
+# every dividend_every bars and a stock split every split_every bars
+def synthetic_history_page(bars, dividend_every=63, split_every=1250):
+    rows = []
+    for number, (date, close, volume) in enumerate(synthetic_bars(bars)):
+        day = date.strftime("%b %d, %Y")
+        if number % dividend_every == dividend_every - 1:
+            rows.append(f'<tr class="row"><td class="date">{day}</td><td colspan="6"><span>0.24 Dividend</span></td></tr>')
+        if number % split_every == split_every - 1:
+            rows.append(f'<tr class="row"><td class="date">{day}</td><td colspan="6"><span>2:1 Stock Split</span></td></tr>')
+        prices = "".join(f'<td class="price">{value:,.2f}</td>' for value in (close, close * 1.01, close * 0.99, close, close))
+        rows.append(f'<tr class="row"><td class="date">{day}</td>{prices}<td class="volume">{int(volume):,}</td></tr>')
+    rows.reverse()
+    return ("<html><head><title>History</title></head><body><div id=\"nav\"><ul>"
+            + "".join(f"<li><a href='/quote/X{n}'>X{n}</a></li>" for n in range(200))
+            + "</ul></div><table class=\"table\"><thead><tr><th>Date</th><th>Open</th><th>High</th><th>Low</th>"
+            + "<th>Close</th><th>Adj Close</th><th>Volume</th></tr></thead><tbody>"
+            + "".join(rows) + "</tbody></table><footer>Data provided by a local stand-in</footer></body></html>")
+
+
+# Local stand-in for Yahoo! Finance serving the same recorded page for every history URL
+@contextmanager
+def history_server(page, latency=0.0):
+    body = page.encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if "/history" not in self.path:
+                self.send_error(404)
+                return
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+# Browserless HTTP backend against the local stand-in (simulated network latency per request)
+def bench_http_fetch(symbol_count=200, bars=60, latency=0.1):
+    print(f"--- http backend: {symbol_count} symbols x {bars} bars, {latency * 1000:.0f} ms simulated latency ---")
+    with history_server(synthetic_history_page(bars), latency) as base_url:
+        for max_connections in (1, 8, 32):
+            stock_list = [Stock(f"S{number:04d}", "Synthetic", 100) for number in range(symbol_count)]
+            latencies = []
+            begin = time.perf_counter()
+            records = stock_data.retrieve_stock_web("01/01/24", "12/31/24", stock_list, backend="http",
+                                                    max_connections=max_connections, base_url=base_url, cache=False,
+                                                    progress=lambda symbol, count, seconds, cached: latencies.append(seconds))
+            elapsed = time.perf_counter() - begin
+            latencies.sort()
+            report(f"http, {max_connections} connections", elapsed, symbol_count, unit="symbols",
+                   extra=f"{records:,} records  median fetch {latencies[len(latencies) // 2] * 1000:.0f} ms")
+
+
+# Cold retrieval vs a repeat served from the on-disk page cache
+def bench_web_cache(symbol_count=200, bars=252, latency=0.1):
+    print(f"--- web cache: {symbol_count} symbols x {bars} bars, {latency * 1000:.0f} ms simulated latency ---")
+    with tempfile.TemporaryDirectory() as scratch, history_server(synthetic_history_page(bars), latency) as base_url:
+        cache = PageCache(os.path.join(scratch, "web_cache"))
+        for label in ("cold", "warm"):
+            stock_list = [Stock(f"S{number:04d}", "Synthetic", 100) for number in range(symbol_count)]
+            begin = time.perf_counter()
+            stock_data.retrieve_stock_web("01/01/24", "12/31/24", stock_list, backend="http", base_url=base_url, cache=cache)
+            stats = cache.stats()
+            report(f"http retrieval, {label} cache", time.perf_counter() - begin, symbol_count, unit="symbols",
+                   extra=f"hits {stats['hits']} misses {stats['misses']} {stats['bytes'] / 2**10:,.0f} KiB")
+
+
+# Write file_count Yahoo-style CSV files of bars_per_file rows into directory
+def write_synthetic_csvs(directory, file_count, bars_per_file):
+    lines = ["Date,Open,High,Low,Close,Adj Close,Volume"]
+    for date, close, volume in synthetic_bars(bars_per_file):
+        lines.append(f"{date:%Y-%m-%d},{close:.2f},{close:.2f},{close:.2f},{close:.2f},{close:.2f},{int(volume)}")
+    text = "\n".join(lines) + "\n"
+    for number in range(file_count):
+        with open(os.path.join(directory, f"S{number:05d}_yahoo.csv"), "w") as fh:
+            fh.write(text)
+
+
+# The original single-file import: csv.reader and strptime per row into a Stock
+def legacy_import_csv(stock, filename):
+    with open(filename, newline='') as stockdata:
+        datareader = csv.reader(stockdata, delimiter=',')
+        next(datareader)
+        for row in datareader:
+            stock.add_data(DailyData(datetime.strptime(row[0], "%Y-%m-%d"), float(row[4]), float(row[6])))
+
+
+# Per-file csv.reader import (plus save) vs the parallel directory importer
+def bench_csv_import(file_count=2000, bars_per_file=252, legacy_files=2000):
+    rows = file_count * bars_per_file
+    print(f"--- CSV import: {file_count:,} files x {bars_per_file} rows = {rows:,} rows ---")
+    with scratch_database() as scratch:
+        directory = os.path.join(scratch, "import_csvs")
+        os.mkdir(directory)
+        write_synthetic_csvs(directory, file_count, bars_per_file)
+        begin = time.perf_counter()
+        stock_list = []
+        for filename in sorted(os.listdir(directory))[:legacy_files]:
+            stock = Stock(filename.split("_")[0], "Synthetic", 0)
+            legacy_import_csv(stock, os.path.join(directory, filename))
+            stock_list.append(stock)
+        stock_data.save_stock_data(stock_list)
+        elapsed = time.perf_counter() - begin
+        report(f"csv.reader per file ({legacy_files} files)", elapsed, legacy_files * bars_per_file,
+               extra=f"{legacy_files / elapsed * 60:,.0f} files/min")
+        begin = time.perf_counter()
+        file_total, record_total = stock_data.import_stock_csv_directory(directory)
+        elapsed = time.perf_counter() - begin
+        report("directory import", elapsed, record_total, extra=f"{file_total / elapsed * 60:,.0f} files/min")
+
+
+# Peak memory of the streaming import at growing file sizes (should stay flat), next to
+# reading the whole export into per-symbol row lists first as convert_dailydata_for_import used to
+def bench_stream_import(symbol_count=100, bar_counts=(2500, 10000), chunk_rows=100000):
+    print(f"--- streaming CSV import: {symbol_count} symbols, chunks of {chunk_rows:,} rows ---")
+    for bars_per_symbol in bar_counts:
+        rows = symbol_count * bars_per_symbol
+        with scratch_database() as scratch:
+            filename = os.path.join(scratch, "dailyData_export.csv")
+            with open(filename, "w") as fh:
+                fh.write("symbol,date,price,volume\n")
+                bars = [(f"{date:%m/%d/%y}", close, volume) for date, close, volume in synthetic_bars(bars_per_symbol)]
+                for number in range(symbol_count):
+                    fh.writelines(f"S{number:04d},{day},{close:.2f},{volume}\n" for day, close, volume in bars)
+            del bars
+
+            def read_all():
+                grouped = {}
+                with open(filename) as fh:
+                    for row in csv.DictReader(fh):
+                        grouped.setdefault(row["symbol"], []).append(row)
+                return len(grouped)
+
+            _, seconds, peak = measure(read_all)
+            report(f"read whole export, {rows:,} rows", seconds, rows, extra=f"peak {peak / 2**20:,.1f} MiB")
+            _, seconds, peak = measure(lambda: stock_data.stream_csv_to_database(filename, chunk_rows=chunk_rows))
+            report(f"stream to database, {rows:,} rows", seconds, rows, extra=f"peak {peak / 2**20:,.1f} MiB")
+
+
+# The original page parser: full BeautifulSoup tree, every <tr>, strptime per row
+def legacy_parse_history_rows(page_source):
+    soup = BeautifulSoup(page_source, "html.parser")
+    rows = []
+    for row in soup.find_all('tr'):
+        rowList = [i.text for i in row.find_all('td')]
+        if len(rowList) == 7:
+            rows.append(DailyData(datetime.strptime(rowList[0], "%b %d, %Y"), float(rowList[5].replace(',', '')), float(rowList[6].replace(',', ''))))
+    return rows
+
+
+# BeautifulSoup tree parsing vs the streaming history-table parser on 1, 5 and 20 year pages
+def bench_parse(repeats=5):
+    print("--- history page parsing ---")
+    for years in (1, 5, 20):
+        page = synthetic_history_page(years * 252)
+        for name, parse in (("BeautifulSoup", legacy_parse_history_rows), ("history table parser", stock_data._parse_history_rows)):
+            begin = time.perf_counter()
+            for _ in range(repeats):
+                rows = parse(page)
+            report(f"{name}, {years}y page", (time.perf_counter() - begin) / repeats, len(rows),
+                   extra=f"{len(page) / 2**10:,.0f} KiB")
+
+
+# The chart as drawn before downsampling: every close with a marker, one volume bar per day
+def legacy_chart(stock):
+    fig = Figure(figsize=(10, 5))
+    FigureCanvasAgg(fig)
+    bars = stock.window()
+    dates = [data.date for data in bars]
+    ax_price = fig.add_subplot()
+    ax_price.plot(dates, [data.close for data in bars], marker="o", color="#1f77b4", label="Close Price")
+    ax_volume = ax_price.twinx()
+    ax_volume.bar(dates, [data.volume for data in bars], alpha=0.2, color="#7f7f7f", label="Volume")
+    fig.tight_layout()
+    fig.canvas.draw()
+
+
+# Render time of the whole history, then of a zoom to its last tenth, for several history lengths
+def bench_chart(lengths=(1_000, 5_000, 20_000, 100_000, 1_000_000), legacy_limit=5_000):
+    print("--- chart rendering (Agg, 1000x500 px) ---")
+    for length in lengths:
+        stock = Stock("BENCH", "Benchmark", 100)
+        for date, close, volume in synthetic_bars(length):
+            stock.add_data(DailyData(date, close, volume))
+        if length <= legacy_limit:
+            begin = time.perf_counter()
+            legacy_chart(stock)
+            report(f"legacy chart, {length:,} bars", time.perf_counter() - begin, length, "bars")
+        fig = Figure(figsize=(10, 5))
+        FigureCanvasAgg(fig)
+        chart = charts.PriceChart(fig)
+        begin = time.perf_counter()
+        chart.set_stock(stock)
+        fig.canvas.draw()
+        report(f"downsampled chart, {length:,} bars", time.perf_counter() - begin, length, "bars",
+               extra=f"{len(chart.close_line.get_xdata()):,} points drawn")
+        low, high = chart.ax_price.get_xlim()
+        begin = time.perf_counter()
+        chart.ax_price.set_xlim(high - (high - low) / 10, high)
+        fig.canvas.draw()
+        report("  zoom to last 10%", time.perf_counter() - begin,
+               extra=f"{len(chart.close_line.get_xdata()):,} points drawn")
+
+
+# Batch chart export: every chart drawn, then a second run with nothing changed
+def bench_chart_export(symbol_count=100, bars_per_symbol=2520):
+    print(f"--- chart export: {symbol_count} symbols x {bars_per_symbol:,} bars ---")
+    with scratch_database() as scratch:
+        stock_data.save_stock_data(synthetic_portfolio(symbol_count, bars_per_symbol))
+        output_dir = os.path.join(scratch, "exported_charts")
+        for run in ("first run", "unchanged"):
+            results, timing = chart_export.export_charts(output_dir, "png")
+            rendered = [result["seconds"] for result in results if result["status"] == "rendered"]
+            per_chart = f", {sum(rendered) / len(rendered):.3f}s per chart" if rendered else ""
+            report(f"export_charts, {run}", timing["seconds"], symbol_count, unit="symbols",
+                   extra=f"{timing['rendered']} rendered, {timing['workers']} workers{per_chart}")
+
+
+BENCHMARKS = {
+    "price_series": bench_price_series,
+    "add_data": bench_add_data,
+    "summary": bench_summary,
+    "window": bench_window,
+    "indicators": bench_indicators,
+    "analytics": bench_analytics,
+    "portfolio": bench_portfolio,
+    "report": bench_report,
+    "save": bench_save,
+    "load": bench_load,
+    "migrate": bench_migrate,
+    "concurrency": bench_concurrency,
+    "http_fetch": bench_http_fetch,
+    "parse": bench_parse,
+    "web_cache": bench_web_cache,
+    "csv_import": bench_csv_import,
+    "stream_import": bench_stream_import,
+    "chart": bench_chart,
+    "chart_export": bench_chart_export,
+}
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark {name}. Choose from: {', '.join(BENCHMARKS)}")
+            continue
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    # execute only if run as a stand-alone script
+    main()
@@ -0,0 +1,184 @@
+# Summary: This module exports every stock's price/volume chart to image files without any user interaction,
+# for the nightly publishing run. Charts are drawn off screen with the Agg backend (or as SVG) by the same
+# charts.PriceChart the program shows, across a pool of worker processes that each read their share of the
+# symbols from the database. A hash of each stock's history and the chart settings is kept beside the
+# images, so a chart whose data has not changed since it was last written is skipped. The time taken to
+# render each chart is reported.
+#   python chart_export.py --output exported_charts --format png
+#   python chart_export.py --output exported_charts --format svg --symbols AAPL,MSFT --force
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from stock_class import Stock
+import charts
+import stock_data
+import stock_db
+
+FORMATS = ("png", "svg")
+MANIFEST = "chart_hashes.json" # file name -> hash of what it was drawn from, kept in the output directory
+CHART_VERSION = 1 # bump when the chart's appearance changes, so every chart is drawn again
+CHUNK_SYMBOLS = 20 # symbols handed to a worker at a time
+FIGSIZE = (10, 5)
+DPI = 100
+
+
+def chart_file(symbol, fmt):
+    return f"{symbol.upper()}.{fmt}"
+
+
+# Hash of everything a chart is drawn from: the stock's history and the chart settings
+def chart_hash(stock, fmt, figsize=FIGSIZE, dpi=DPI):
+    series = stock.DataList
+    digest = hashlib.sha256(json.dumps([CHART_VERSION, stock.symbol, fmt, list(figsize), dpi]).encode())
+    for column in (series.dates, series.closes, series.volumes):
+        digest.update(column)
+    return digest.hexdigest()
+
+
+# Off-screen chart for rendering files; one is reused for every chart a worker draws
+def export_chart(figsize=FIGSIZE, dpi=DPI):
+    figure = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(figure)
+    return charts.PriceChart(figure)
+
+
+# Draw one stock's chart to filename (the format follows its extension)
+def render_chart(stock, filename, chart=None):
+    chart = chart or export_chart()
+    chart.set_stock(stock)
+    chart.figure.autofmt_xdate()
+    chart.figure.savefig(filename)
+
+
+# Export the charts for one chunk of symbols, read from the database (runs in a worker process).
+# hashes holds the hash each file was last drawn from; a file whose hash still matches is left alone.
+# Returns one result per symbol: symbol, file, status (rendered, unchanged or empty), hash and seconds.
+def _export_charts(symbols, hashes, output_dir, fmt, force=False, db_path=None):
+    if db_path and db_path != stock_db.database_path():
+        stock_db.configure(path=db_path)
+    stockSelectCmd = f"""SELECT symbol, name, shares
+                    FROM stocks
+                    WHERE symbol IN ({", ".join("?" * len(symbols))})
+                    ORDER BY symbol; """
+    history_source = stock_data.HistoryCache(max_resident=1)
+    chart = None
+    results = []
+    for symbol, name, shares in stock_db.get_connection().execute(stockSelectCmd, symbols):
+        begin = time.perf_counter()
+        stock = Stock(symbol, name, shares, history_source)
+        filename = chart_file(symbol, fmt)
+        digest = chart_hash(stock, fmt)
+        if not stock.DataList:
+            status = "empty"
+        elif not force and hashes.get(filename) == digest and os.path.exists(os.path.join(output_dir, filename)):
+            status = "unchanged"
+        else:
+            chart = chart or export_chart()
+            render_chart(stock, os.path.join(output_dir, filename), chart)
+            status = "rendered"
+        stock.unload_history()
+        results.append({"symbol": symbol, "file": filename, "status": status, "hash": digest,
+                         "seconds": time.perf_counter() - begin})
+    return results
+
+
+def _database_symbols():
+    with stock_db.transaction(write=False) as conn:
+        return [symbol for (symbol,) in conn.execute("SELECT symbol FROM stocks ORDER BY symbol;")]
+
+
+def _read_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST)) as manifest:
+            return json.load(manifest)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+# Replace the manifest in one step, so an interrupted run never leaves half of it
+def _write_manifest(output_dir, hashes):
+    path = os.path.join(output_dir, MANIFEST)
+    with open(path + ".tmp", "w") as manifest:
+        json.dump(hashes, manifest, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+# Export the chart of every stock in the database (or only symbols) to output_dir as fmt files.
+# Charts whose data and settings are unchanged since the last export are skipped unless force is set.
+# progress(result) is called with each chart's result as it arrives, in symbol order.
+# Returns the results and the timing figures: rendered, unchanged, empty, seconds, workers.
+def export_charts(output_dir, fmt="png", symbols=None, force=False, workers=None, progress=None):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown chart format {fmt}. Choose from: {', '.join(FORMATS)}")
+    begin = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    wanted = {symbol.upper() for symbol in symbols} if symbols else None
+    all_symbols = [symbol for symbol in _database_symbols() if not wanted or symbol.upper() in wanted]
+    hashes = _read_manifest(output_dir)
+    chunks = [all_symbols[i:i + CHUNK_SYMBOLS] for i in range(0, len(all_symbols), CHUNK_SYMBOLS)]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(chunks)))
+    export = partial(_export_charts, output_dir=output_dir, fmt=fmt, force=force,
+                     db_path=os.path.abspath(stock_db.database_path()))
+    # each worker gets only the hashes for its own symbols
+    jobs = [(chunk, {chart_file(symbol, fmt): hashes[chart_file(symbol, fmt)]
+                     for symbol in chunk if chart_file(symbol, fmt) in hashes}) for chunk in chunks]
+    results = []
+    # a single worker gains nothing from a separate process, so render in this one
+    parallel = workers > 1
+    try:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=stock_data.PROCESS_CONTEXT) if parallel else nullcontext()
+        with pool as executor:
+            mapper = executor.map if parallel else map
+            for chunk_results in mapper(export, *zip(*jobs)) if jobs else ():
+                for result in chunk_results:
+                    if result["status"] != "empty":
+                        hashes[result["file"]] = result["hash"]
+                    results.append(result)
+                    if progress:
+                        progress(result)
+    finally:
+        # keep the hashes of the charts written so far, even if the run stops part way
+        _write_manifest(output_dir, hashes)
+    timing = {status: sum(result["status"] == status for result in results)
+              for status in ("rendered", "unchanged", "empty")}
+    timing.update({"seconds": time.perf_counter() - begin, "workers": workers})
+    return results, timing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export every stock's chart to image files without user interaction.")
+    parser.add_argument("--output", default="exported_charts",
+                        help="directory for the chart files (default: exported_charts)")
+    parser.add_argument("--format", choices=FORMATS, default="png")
+    parser.add_argument("--db", help="database path (default: stocks.db)")
+    parser.add_argument("--symbols", help="comma-separated symbols to export (default: all)")
+    parser.add_argument("--force", action="store_true", help="draw every chart, even if its data is unchanged")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+    if args.db:
+        stock_db.configure(path=args.db)
+    stock_data.create_database()
+    symbols = [symbol.strip() for symbol in args.symbols.split(",") if symbol.strip()] if args.symbols else None
+
+    def show(result):
+        print(f"{result['symbol']:<10} {result['status']:<10} {result['seconds']:8.3f}s  {result['file']}")
+
+    results, timing = export_charts(args.output, args.format, symbols, args.force, args.workers, progress=show)
+    rendered = [result["seconds"] for result in results if result["status"] == "rendered"]
+    average = f", {sum(rendered) / len(rendered):.3f}s per chart" if rendered else ""
+    print(f"{timing['rendered']} rendered, {timing['unchanged']} unchanged, {timing['empty']} without history "
+          f"in {timing['seconds']:.3f}s ({timing['workers']} workers{average})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    # execute only if run as a stand-alone script
+    main()
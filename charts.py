@@ -0,0 +1,152 @@
+# Summary: This module draws a stock's closing price and volume chart so it stays fast for long histories.
+# Only about as many points as the plot is wide are drawn: the visible bars are split into one bucket per
+# pixel column and each bucket keeps its first, lowest, highest and last close (min/max bucketing), so the
+# line looks the same as one through every bar. Volume is a single stepped patch holding the largest volume
+# in each bucket instead of one bar per day. Zooming, panning or resizing picks the points again for the
+# new range, so detail comes back as the range narrows.
+
+from datetime import datetime
+import matplotlib.dates as mdates
+import numpy as np
+from matplotlib.figure import Figure
+import indicators
+
+MARKER_LIMIT = 60 # closes get a marker when no more bars than this are visible
+PRICE_COLOR = "#1f77b4"
+INDICATOR_COLOR = "#ff7f0e"
+VOLUME_COLOR = "#7f7f7f"
+
+
+# matplotlib date numbers for day ordinals
+def date_numbers(ordinals):
+    epoch = datetime(1970, 1, 1)
+    return np.asarray(ordinals, dtype="float64") + (mdates.date2num(epoch) - epoch.toordinal())
+
+
+# Bars per bucket when count bars are split into at most buckets buckets
+def _bucket_size(count, buckets):
+    return max(1, -(-count // max(buckets, 1)))
+
+
+# values as rows of size items, the last row padded with fill
+def _buckets(values, size, fill):
+    rows = -(-len(values) // size)
+    padded = np.full(rows * size, fill, dtype="float64")
+    padded[:len(values)] = values
+    return padded.reshape(rows, size)
+
+
+# Indices (sorted) of the values to draw so a line through them looks like one through all of them:
+# the first, lowest, highest and last value of each of at most buckets equal runs of values
+def minmax_indices(values, buckets):
+    count = len(values)
+    if count <= 4 * buckets:
+        return np.arange(count)
+    size = _bucket_size(count, buckets)
+    # padding repeats the last value, so a padded slot is never the first minimum or maximum of its row
+    rows = _buckets(values, size, values[-1])
+    starts = np.arange(len(rows)) * size
+    keep = np.concatenate((starts, np.minimum(starts + size - 1, count - 1),
+                           starts + rows.argmin(axis=1), starts + rows.argmax(axis=1)))
+    return np.unique(np.minimum(keep, count - 1))
+
+
+# Volume as a step outline: the largest volume in each bucket and the bucket edges (date numbers)
+def volume_steps(x, volumes, buckets):
+    if not len(x):
+        return np.zeros(1), np.array([0.0, 1.0])
+    size = _bucket_size(len(x), buckets)
+    values = _buckets(volumes, size, 0.0).max(axis=1) if size > 1 else np.asarray(volumes, dtype="float64")
+    edges = np.append(x[::size], x[-1] + 1.0)
+    return values, edges
+
+
+# A price/volume chart whose artists are created once and given new data as the stock or the
+# visible range changes. figure may come from pyplot, a Tk canvas or be drawn off screen.
+# layout is the figure's layout engine; constrained layout fits the labels but roughly doubles the
+# cost of a draw, so a chart redrawn often can pass None and set fixed margins instead.
+class PriceChart:
+    def __init__(self, figure=None, layout="constrained"):
+        self.figure = figure or Figure(figsize=(10, 5))
+        if layout:
+            self.figure.set_layout_engine(layout)
+        self.ax_price = self.figure.add_subplot()
+        self.ax_volume = self.ax_price.twinx()
+        # volume is drawn behind the price line
+        self.ax_price.set_zorder(self.ax_volume.get_zorder() + 1)
+        self.ax_price.patch.set_visible(False)
+        self.close_line, = self.ax_price.plot([], [], color=PRICE_COLOR, markersize=3, label="Close Price")
+        self.sma_line, = self.ax_price.plot([], [], color=INDICATOR_COLOR, linewidth=1,
+                                            label=f"SMA({indicators.SMA_WINDOW})")
+        self.bands = self.ax_price.fill_between([], [], [], color=INDICATOR_COLOR, alpha=0.1, label="Bollinger Bands")
+        self.volume = self.ax_volume.stairs([0.0], [0.0, 1.0], fill=True, color=VOLUME_COLOR, alpha=0.2,
+                                            label="Volume")
+        self.ax_price.xaxis_date()
+        self.legend = self.ax_price.legend(loc="upper left")
+        self.ax_price.set_xlabel("Date")
+        self.ax_price.set_ylabel("Price", color=PRICE_COLOR)
+        self.ax_price.tick_params(axis="y", labelcolor=PRICE_COLOR)
+        self.ax_volume.set_ylabel("Volume", color=VOLUME_COLOR)
+        self.title = self.figure.suptitle("")
+        self.symbol = None
+        self._set_columns(*(np.empty(0),) * 6)
+        self.ax_price.callbacks.connect("xlim_changed", lambda ax: self.refresh())
+        self.figure.canvas.mpl_connect("resize_event", lambda event: self.refresh())
+
+    def _set_columns(self, x, closes, volumes, sma, lower, upper):
+        self.x, self.closes, self.volumes = x, closes, volumes
+        self.sma, self.lower, self.upper = sma, lower, upper
+
+    # Chart a stock's history between start and end (dates, inclusive); returns the number of bars
+    def set_stock(self, stock, start=None, end=None):
+        bars = stock.window(start, end)
+        values = indicators.indicators(stock)
+        # the window's columns are already copies, so numpy can use them without copying again
+        self._set_columns(date_numbers(bars.dates), np.frombuffer(bars.closes), np.frombuffer(bars.volumes),
+                          np.array(values.sma[bars.start:bars.stop]),
+                          np.array(values.bollinger_lower[bars.start:bars.stop]),
+                          np.array(values.bollinger_upper[bars.start:bars.stop]))
+        self.symbol = stock.symbol
+        self.title.set_text(f"{stock.symbol} - Closing Price & Volume")
+        self.reset_view()
+        return len(self.x)
+
+    # Show the whole charted range (redrawing the points for it)
+    def reset_view(self):
+        if not len(self.x):
+            self.refresh()
+            return
+        low = np.nanmin(np.concatenate((self.closes, self.lower)))
+        high = np.nanmax(np.concatenate((self.closes, self.upper)))
+        margin = (high - low) * 0.05 or abs(high) * 0.05 or 1.0
+        self.ax_price.set_ylim(low - margin, high + margin)
+        self.ax_volume.set_ylim(0, (self.volumes.max() or 1.0) * 1.1)
+        # a single bar still gets a day either side so the range is not empty
+        self.ax_price.set_xlim(self.x[0] - (len(self.x) == 1), self.x[-1] + (len(self.x) == 1))
+
+    # Empty the chart (no stock selected)
+    def clear(self):
+        self._set_columns(*(np.empty(0),) * 6)
+        self.symbol = None
+        self.title.set_text("")
+        self.refresh()
+
+    # The artists holding the stock's data, back to front in the order a full draw paints them, then the
+    # legend that sits over them (the rest of the figure only changes with the axis limits)
+    def data_artists(self):
+        return self.volume, self.bands, self.close_line, self.sma_line, self.legend
+
+    # Give the artists the points for the visible range at the current plot width
+    def refresh(self):
+        low, high = self.ax_price.get_xlim()
+        # one bar either side of the range, so the line runs to the edges of the plot
+        first = max(int(np.searchsorted(self.x, low)) - 1, 0)
+        stop = min(int(np.searchsorted(self.x, high, side="right")) + 1, len(self.x))
+        buckets = max(int(self.ax_price.bbox.width), 1)
+        index = first + minmax_indices(self.closes[first:stop], buckets)
+        x = self.x[index]
+        self.close_line.set_data(x, self.closes[index])
+        self.close_line.set_marker("o" if len(index) <= MARKER_LIMIT else "")
+        self.sma_line.set_data(x, self.sma[index])
+        self.bands.set_data(x, self.lower[index], self.upper[index])
+        self.volume.set_data(*volume_steps(self.x[first:stop], self.volumes[first:stop], buckets))
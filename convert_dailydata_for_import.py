@@ -1,52 +1,94 @@
-"""Reformat the existing dailyData_export.csv into Yahoo-style CSVs for importing."""
+"""Reformat the existing dailyData_export.csv into Yahoo-style CSVs for importing.
+
+The export may list symbols in any order, so its rows are sorted by (symbol, date) with an external
+merge sort: up to CHUNK_ROWS rows at a time are sorted in memory and written to a temporary run file,
+and the runs are then merged. Each symbol's file is written once, front to back, and memory use does
+not depend on the size of the export.
+"""
 
 import csv
-from collections import defaultdict
+import heapq
+import tempfile
 from datetime import datetime
+from itertools import groupby, islice
+from operator import itemgetter
 from pathlib import Path
 
 EXPORT_FILE = Path("dailyData_export.csv")
 OUTPUT_DIR = Path("import_csvs")
+HEADER = ["Date", "Open", "High", "Low", "Close", "Adj Close", "Volume"]
+CHUNK_ROWS = 500000
 
 
-def load_export():
-    grouped = defaultdict(list)
+def iter_export():
     with EXPORT_FILE.open() as fh:
         reader = csv.DictReader(fh)
         for row in reader:
-            grouped[row["symbol"]].append(row)
-    return grouped
+            yield (row["symbol"], *format_row(row))
+
+
+def format_row(row):
+    date = datetime.strptime(row["date"], "%m/%d/%y").strftime("%Y-%m-%d")
+    price = float(row["price"])
+    volume = int(float(row["volume"]))
+    return date, price, volume
 
 
-def format_rows(rows):
-    formatted = []
-    for row in rows:
-        date = datetime.strptime(row["date"], "%m/%d/%y").strftime("%Y-%m-%d")
-        price = float(row["price"])
-        volume = int(float(row["volume"]))
-        formatted.append((date, price, volume))
-    formatted.sort(key=lambda item: item[0])
-    return formatted
+def import_file(symbol):
+    return OUTPUT_DIR / f"{symbol}_yahoo.csv"
 
 
-def write_import_file(symbol, rows):
-    filename = OUTPUT_DIR / f"{symbol}_yahoo.csv"
+def write_row(writer, row):
+    date, price, volume = row
+    writer.writerow([date, f"{price:.2f}", f"{price:.2f}", f"{price:.2f}", f"{price:.2f}", f"{price:.2f}", volume])
+
+
+def write_run(directory, number, rows):
+    filename = Path(directory) / f"run{number}.csv"
     with filename.open("w", newline="") as fh:
-        writer = csv.writer(fh)
-        writer.writerow(["Date", "Open", "High", "Low", "Close", "Adj Close", "Volume"])
-        for date, price, volume in rows:
-            writer.writerow([date, f"{price:.2f}", f"{price:.2f}", f"{price:.2f}", f"{price:.2f}", f"{price:.2f}", volume])
+        csv.writer(fh).writerows((symbol, date, repr(price), volume) for symbol, date, price, volume in rows)
+    return filename
+
+
+def read_run(filename):
+    with filename.open(newline="") as fh:
+        for symbol, date, price, volume in csv.reader(fh):
+            yield symbol, date, float(price), int(volume)
+
+
+# (symbol, date, price, volume) rows of the export in (symbol, date) order, keeping the export's
+# order for equal keys; run files go in directory. An export that fits in one chunk is not written out.
+def sorted_export(directory):
+    key = itemgetter(0, 1)
+    rows = iter_export()
+    runs = []
+    while chunk := sorted(islice(rows, CHUNK_ROWS), key=key):
+        if not runs and len(chunk) < CHUNK_ROWS:
+            yield from chunk
+            return
+        runs.append(write_run(directory, len(runs), chunk))
+    yield from heapq.merge(*(read_run(run) for run in runs), key=key)
+
+
+def convert_export():
+    count = 0
+    with tempfile.TemporaryDirectory() as directory:
+        for symbol, rows in groupby(sorted_export(directory), key=itemgetter(0)):
+            with import_file(symbol).open("w", newline="") as fh:
+                writer = csv.writer(fh)
+                writer.writerow(HEADER)
+                for _, date, price, volume in rows:
+                    write_row(writer, (date, price, volume))
+            count += 1
+    return count
 
 
 def main():
     if not EXPORT_FILE.exists():
         raise SystemExit(f"{EXPORT_FILE} not found. Run sqlite export first.")
     OUTPUT_DIR.mkdir(exist_ok=True)
-    grouped = load_export()
-    for symbol, rows in grouped.items():
-        clean = format_rows(rows)
-        write_import_file(symbol, clean)
-    print(f"Created {len(grouped)} Yahoo-style CSVs under {OUTPUT_DIR}")
+    count = convert_export()
+    print(f"Created {count} Yahoo-style CSVs under {OUTPUT_DIR}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,202 @@
+# Summary: This module computes technical indicators over a stock's daily closes and volumes:
+# simple and exponential moving averages, RSI, MACD, Bollinger bands and average volume.
+# A whole history is computed in one vectorized pass (pandas rolling/ewm). Results are cached
+# per symbol, and when the only change since is newer bars appended to the history, the cached
+# values are brought up to date bar by bar, each new bar costing a fixed amount of work.
+
+import math
+import threading
+import weakref
+from array import array
+import numpy as np
+import pandas as pd
+
+SMA_WINDOW = 20
+EMA_SPAN = 20
+RSI_PERIOD = 14
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+BOLLINGER_WINDOW = 20
+BOLLINGER_STDS = 2.0
+VOLUME_WINDOW = 20
+
+# More new bars than this are recomputed in one vectorized pass instead of one at a time
+INCREMENTAL_LIMIT = 256
+
+COLUMNS = ("sma", "ema", "rsi", "macd", "macd_signal", "macd_histogram",
+           "bollinger_upper", "bollinger_middle", "bollinger_lower", "volume_sma")
+
+_cache = {} # symbol -> Indicators
+_cache_lock = threading.RLock() # re-entrant: _forget can run from garbage collection inside indicators()
+
+
+def _ema_alpha(span):
+    return 2.0 / (span + 1.0)
+
+
+# array('d') holding a float64 numpy/pandas column
+def _to_array(values):
+    column = array("d")
+    column.frombytes(np.ascontiguousarray(values, dtype="float64").tobytes())
+    return column
+
+
+# RSI from Wilder-smoothed average gain and loss (50 when the price has not moved)
+def _rsi(avg_gain, avg_loss):
+    total = avg_gain + avg_loss
+    return 100.0 * avg_gain / total if total > 0 else 50.0
+
+
+# Indicator columns for one PriceSeries, each holding one value per bar (NaN until enough bars).
+# Moving averages are exponential with adjust=False, seeded with the first value;
+# RSI smooths gains and losses with alpha = 1/RSI_PERIOD (Wilder) from the first price change.
+class Indicators:
+    def __init__(self, series):
+        self.series = weakref.ref(series)
+        self.revision = series.revision
+        self.count = 0
+        for column in COLUMNS:
+            setattr(self, column, array("d"))
+        self._ema = self._fast = self._slow = self._signal = math.nan
+        self._avg_gain = self._avg_loss = math.nan
+        self.compute(series)
+
+    # Recompute every column from the whole history in one vectorized pass
+    def compute(self, series):
+        closes = pd.Series(np.array(series.closes, dtype="float64"))
+        volumes = pd.Series(np.array(series.volumes, dtype="float64"))
+        ema = closes.ewm(span=EMA_SPAN, adjust=False).mean()
+        fast = closes.ewm(span=MACD_FAST, adjust=False).mean()
+        slow = closes.ewm(span=MACD_SLOW, adjust=False).mean()
+        macd = fast - slow
+        signal = macd.ewm(span=MACD_SIGNAL, adjust=False).mean()
+        delta = closes.diff()
+        avg_gain = delta.clip(lower=0).ewm(alpha=1.0 / RSI_PERIOD, adjust=False).mean()
+        avg_loss = (-delta).clip(lower=0).ewm(alpha=1.0 / RSI_PERIOD, adjust=False).mean()
+        total = (avg_gain + avg_loss).to_numpy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rsi = np.where(total > 0, 100.0 * avg_gain.to_numpy() / total, 50.0)
+        rsi[:RSI_PERIOD] = np.nan
+        middle = closes.rolling(BOLLINGER_WINDOW).mean()
+        spread = BOLLINGER_STDS * closes.rolling(BOLLINGER_WINDOW).std(ddof=0)
+        self.sma = _to_array(closes.rolling(SMA_WINDOW).mean())
+        self.ema = _to_array(ema)
+        self.rsi = _to_array(rsi)
+        self.macd = _to_array(macd)
+        self.macd_signal = _to_array(signal)
+        self.macd_histogram = _to_array(macd - signal)
+        self.bollinger_upper = _to_array(middle + spread)
+        self.bollinger_middle = _to_array(middle)
+        self.bollinger_lower = _to_array(middle - spread)
+        self.volume_sma = _to_array(volumes.rolling(VOLUME_WINDOW).mean())
+        self.count = len(closes)
+        if self.count:
+            self._ema, self._fast, self._slow, self._signal = ema.iat[-1], fast.iat[-1], slow.iat[-1], signal.iat[-1]
+            self._avg_gain, self._avg_loss = avg_gain.iat[-1], avg_loss.iat[-1]
+        self.revision = series.revision
+
+    # Extend the columns over bars appended since the last update
+    def update(self, series):
+        closes = series.closes
+        volumes = series.volumes
+        for index in range(self.count, len(closes)):
+            self._append(closes, volumes, index)
+        self.count = len(closes)
+
+    # Mean of the window ending at index, or NaN before the window fills
+    @staticmethod
+    def _window_mean(values, index, window):
+        if index + 1 < window:
+            return math.nan
+        return math.fsum(values[index + 1 - window:index + 1]) / window
+
+    def _append(self, closes, volumes, index):
+        close = closes[index]
+        if index == 0:
+            self._ema = self._fast = self._slow = close
+            self._signal = 0.0
+        else:
+            self._ema += _ema_alpha(EMA_SPAN) * (close - self._ema)
+            self._fast += _ema_alpha(MACD_FAST) * (close - self._fast)
+            self._slow += _ema_alpha(MACD_SLOW) * (close - self._slow)
+            change = close - closes[index - 1]
+            gain, loss = max(change, 0.0), max(-change, 0.0)
+            if index == 1:
+                self._avg_gain, self._avg_loss = gain, loss
+            else:
+                self._avg_gain += (gain - self._avg_gain) / RSI_PERIOD
+                self._avg_loss += (loss - self._avg_loss) / RSI_PERIOD
+        macd = self._fast - self._slow
+        if index > 0:
+            self._signal += _ema_alpha(MACD_SIGNAL) * (macd - self._signal)
+        middle = self._window_mean(closes, index, BOLLINGER_WINDOW)
+        if math.isnan(middle):
+            spread = math.nan
+        else:
+            window = closes[index + 1 - BOLLINGER_WINDOW:index + 1]
+            spread = BOLLINGER_STDS * math.sqrt(math.fsum((value - middle) ** 2 for value in window) / BOLLINGER_WINDOW)
+        self.sma.append(self._window_mean(closes, index, SMA_WINDOW))
+        self.ema.append(self._ema)
+        self.rsi.append(_rsi(self._avg_gain, self._avg_loss) if index >= RSI_PERIOD else math.nan)
+        self.macd.append(macd)
+        self.macd_signal.append(self._signal)
+        self.macd_histogram.append(macd - self._signal)
+        self.bollinger_upper.append(middle + spread)
+        self.bollinger_middle.append(middle)
+        self.bollinger_lower.append(middle - spread)
+        self.volume_sma.append(self._window_mean(volumes, index, VOLUME_WINDOW))
+
+    # Values for the newest bar, by column name (None if there are no bars)
+    def latest(self):
+        if not self.count:
+            return None
+        return {column: getattr(self, column)[-1] for column in COLUMNS}
+
+
+# Indicators for a stock's history, from the cache when it is current.
+# Bars appended since the cached values were computed are added incrementally; any other change
+# to the history (an older bar inserted or replaced, a reload from the database) recomputes it all.
+def indicators(stock):
+    series = stock.DataList
+    symbol = stock.symbol.upper()
+    with _cache_lock:
+        entry = _cache.get(symbol)
+        if entry is None or entry.series() is not series:
+            entry = Indicators(series)
+            _cache[symbol] = entry
+            # forget the entry once its history is unloaded, so the cache does not pin it
+            weakref.finalize(series, _forget, symbol, entry)
+        elif entry.revision != series.revision or len(series) - entry.count > INCREMENTAL_LIMIT:
+            entry.compute(series)
+        elif len(series) > entry.count:
+            entry.update(series)
+        return entry
+
+
+def _forget(symbol, entry):
+    with _cache_lock:
+        if _cache.get(symbol) is entry:
+            del _cache[symbol]
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def _format(value):
+    return "n/a" if math.isnan(value) else f"{value:,.2f}"
+
+
+# Latest indicator values as report lines, shared by the console and GUI reports
+def report_lines(stock):
+    latest = indicators(stock).latest()
+    if not latest:
+        return []
+    return [f"SMA({SMA_WINDOW}): {_format(latest['sma'])}  EMA({EMA_SPAN}): {_format(latest['ema'])}  "
+            f"RSI({RSI_PERIOD}): {_format(latest['rsi'])}",
+            f"MACD: {_format(latest['macd'])}  Signal: {_format(latest['macd_signal'])}  "
+            f"Histogram: {_format(latest['macd_histogram'])}",
+            f"Bollinger: {_format(latest['bollinger_lower'])} - {_format(latest['bollinger_upper'])}  "
+            f"Avg Volume({VOLUME_WINDOW}): {_format(latest['volume_sma'])}"]
@@ -1,20 +1,273 @@
 # Summary: This module contains the user interface and logic for a graphical user interface version of the stock manager program.
 
+import queue
+import threading
 from datetime import datetime
-from os import path
 from tkinter import *
 from tkinter import ttk
 from tkinter import messagebox, simpledialog, filedialog
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from matplotlib.figure import Figure
+import charts
 import stock_data
-from stock_class import Stock, DailyData
-from utilities import display_stock_chart, sortStocks, sortDailyData
+import stock_db
+import indicators
+from stock_class import Stock, DailyData, Portfolio
+
+
+# A long operation running on a worker thread (see TaskRunner).
+# The work function receives the task; it calls report() with progress details and should stop
+# early once cancelled is True. report() and cancel() are safe to call from any thread.
+class Task:
+    def __init__(self, name, messages, on_progress=None, on_done=None, on_error=None):
+        self.name = name
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancel_event = threading.Event()
+        self._messages = messages
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def report(self, *details):
+        self._messages.put((self, "progress", details))
+
+
+# Runs long operations (load, save, web retrieval, imports) on a worker thread so the window
+# stays responsive. Workers never touch Tk: they put messages on a queue that the Tk thread
+# drains every POLL_MS with after(), calling the task's on_progress, on_done and on_error there.
+# One long-lived worker runs the tasks in turn, so it keeps a single database connection for the
+# life of the window instead of opening one per task.
+class TaskRunner:
+    POLL_MS = 100
+
+    def __init__(self, root, on_idle=None):
+        self.root = root
+        self.on_idle = on_idle  # called on the Tk thread when the last task finishes
+        self.messages = queue.Queue()
+        self.pending = queue.Queue()
+        self.tasks = set()
+        self.worker = threading.Thread(target=self._work, name="task-worker", daemon=True)
+        self.worker.start()
+        self.root.after(self.POLL_MS, self._poll)
+
+    def busy(self):
+        return bool(self.tasks)
+
+    # Queue work(task) for the worker thread; on_done(result) or on_error(exception) follows on the Tk thread
+    def run(self, name, work, on_progress=None, on_done=None, on_error=None):
+        task = Task(name, self.messages, on_progress, on_done, on_error)
+        self.tasks.add(task)
+        self.pending.put((task, work))
+        return task
+
+    def cancel_all(self):
+        for task in self.tasks:
+            task.cancel()
+
+    # Cancel the tasks and stop the worker once they return
+    def close(self):
+        self.cancel_all()
+        self.pending.put(None)
+
+    def _work(self):
+        try:
+            while True:
+                item = self.pending.get()
+                if item is None:
+                    break
+                task, work = item
+                try:
+                    self.messages.put((task, "done", work(task)))
+                except Exception as err:
+                    self.messages.put((task, "error", err))
+        finally:
+            stock_db.release_connection()
+
+    def _poll(self):
+        try:
+            while True:
+                task, kind, payload = self.messages.get_nowait()
+                if kind == "progress":
+                    if task.on_progress:
+                        task.on_progress(*payload)
+                    continue
+                self.tasks.discard(task)
+                if kind == "done" and task.on_done:
+                    task.on_done(payload)
+                elif kind == "error" and task.on_error:
+                    task.on_error(payload)
+                if not self.tasks and self.on_idle:
+                    self.on_idle()
+        except queue.Empty:
+            pass
+        self.root.after(self.POLL_MS, self._poll)
+
+
+# Price/volume chart embedded in the window. The figure and its artists are built once; showing
+# another stock gives the existing artists new data. Everything that changes with the stock (the data,
+# the axes' ticks and labels, the title) is animated, so a full draw leaves only the fixed parts of the
+# figure; that is kept as a background, and showing a stock restores it and draws just the animated
+# artists over it (blitting). The whole figure is drawn only when its size changes or the toolbar
+# zooms or pans. A stock chosen while the chart is hidden is charted when the chart next appears.
+class StockChart(Frame):
+    def __init__(self, master):
+        super().__init__(master)
+        self.figure = Figure(figsize=(6, 4), dpi=100)
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self)
+        # fixed margins: the chart is redrawn on every selection, and constrained layout doubles a draw
+        self.chart = charts.PriceChart(self.figure, layout=None)
+        self.figure.subplots_adjust(left=0.13, right=0.87, bottom=0.12, top=0.9)
+        volume, bands, close_line, sma_line, legend = self.chart.data_artists()
+        # back to front in the order a full draw paints them: each axes' data under its spines and
+        # ticks, the volume axes under the price axes, then the legend and title
+        self.animated = (volume, *self.chart.ax_volume.spines.values(), self.chart.ax_volume.xaxis,
+                         self.chart.ax_volume.yaxis, bands, close_line, sma_line,
+                         *self.chart.ax_price.spines.values(), self.chart.ax_price.xaxis, self.chart.ax_price.yaxis,
+                         legend, self.chart.title)
+        for artist in self.animated:
+            artist.set_animated(True)
+        toolbar = NavigationToolbar2Tk(self.canvas, self, pack_toolbar=False)
+        toolbar.update()
+        toolbar.pack(side=BOTTOM, fill=X)
+        self.canvas.get_tk_widget().pack(side=TOP, fill=BOTH, expand=True)
+        self.background = None  # the figure's fixed parts, from the last full draw
+        self.drawn_size = None  # canvas size at that draw
+        self.pending = None     # (stock or None,) chosen while the chart was hidden
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+        self.bind("<Map>", self._on_map)
+
+    # Chart stock (None empties the chart); while the chart is hidden this only records the choice
+    def show(self, stock):
+        if not self.winfo_ismapped():
+            self.pending = (stock,)
+            return
+        self.pending = None
+        if stock is not None:
+            self.chart.set_stock(stock)
+        elif self.chart.symbol is not None:
+            self.chart.clear()
+        else:
+            return
+        self._render()
+
+    def clear(self):
+        self.show(None)
+
+    def _on_map(self, evt):
+        if self.pending:
+            self.show(*self.pending)
+
+    def _render(self):
+        if self.background is None or self.canvas.get_width_height() != self.drawn_size:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.background)
+        self._draw_animated()
+        self.canvas.blit(self.figure.bbox)
+
+    # After a full draw (which skips the animated artists): keep the background, then add the rest
+    def _on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.drawn_size = self.canvas.get_width_height()
+        self._draw_animated()
+
+    def _draw_animated(self):
+        for artist in self.animated:
+            self.figure.draw_artist(artist)
+
+
+# Daily history table that only builds the rows it shows.
+# The Treeview holds one item per visible line; scrolling moves a window over the bars and
+# rewrites those items from it, so showing or scrolling a history costs the same however long it is.
+class HistoryTable(Frame):
+    HEADER_PX = 24 # approximate height of the column headings
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.tree = ttk.Treeview(self, columns=("date", "close", "volume"), show="headings", selectmode="none")
+        for column, heading, width in (("date", "Date", 100), ("close", "Close", 110), ("volume", "Volume", 140)):
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=width, anchor=E if column != "date" else W)
+        self.scrollbar = Scrollbar(self, orient=VERTICAL, command=self._scroll)
+        self.tree.pack(side=LEFT, fill=BOTH, expand=True)
+        self.scrollbar.pack(side=RIGHT, fill=Y)
+        self.bars = None    # sequence of DailyData being shown (a PriceSeries or PriceWindow)
+        self.top = 0        # index of the bar on the first visible line
+        self.row_height = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        self.tree.bind("<Configure>", lambda evt: self._render())
+        self.tree.bind("<MouseWheel>", self._wheel)
+        self.tree.bind("<Button-4>", lambda evt: self._move(-3))
+        self.tree.bind("<Button-5>", lambda evt: self._move(3))
+        self.tree.bind("<Prior>", lambda evt: self._move(-self._capacity()))
+        self.tree.bind("<Next>", lambda evt: self._move(self._capacity()))
+        self.tree.bind("<Home>", lambda evt: self._move(-len(self.bars or ())))
+        self.tree.bind("<End>", lambda evt: self._move(len(self.bars or ())))
+
+    def show(self, bars):
+        self.bars = bars
+        self.top = 0
+        self._render()
+
+    def clear(self):
+        self.show(None)
+
+    # Lines that fit in the widget's current height
+    def _capacity(self):
+        return max(1, (self.tree.winfo_height() - self.HEADER_PX) // self.row_height)
+
+    def _move(self, lines):
+        self.top += lines
+        self._render()
+        return "break"
+
+    def _wheel(self, evt):
+        # Windows reports multiples of 120 per notch, macOS small deltas
+        steps = evt.delta // 120 if abs(evt.delta) >= 120 else evt.delta
+        return self._move(-3 * steps)
+
+    # Scrollbar commands: ("moveto", fraction) or ("scroll", count, "units" | "pages")
+    def _scroll(self, action, amount, unit=None):
+        count = len(self.bars or ())
+        if action == "moveto":
+            self.top = int(float(amount) * count)
+            self._render()
+        else:
+            self._move(int(amount) * (self._capacity() if unit == "pages" else 1))
+
+    def _render(self):
+        count = len(self.bars or ())
+        rows = self._capacity()
+        self.top = max(0, min(self.top, count - rows))
+        items = self.tree.get_children()
+        for item in items[rows:]:
+            self.tree.delete(item)
+        items = list(items[:rows])
+        while len(items) < min(rows, count):
+            items.append(self.tree.insert("", END))
+        for line, item in enumerate(items):
+            index = self.top + line
+            if index < count:
+                daily_data = self.bars[index]
+                self.tree.item(item, values=(daily_data.date.strftime('%m/%d/%y'), '${:,.2f}'.format(daily_data.close),
+                                             f"{int(daily_data.volume):,}"))
+            else:
+                self.tree.delete(item)
+        if count:
+            self.scrollbar.set(self.top / count, min(1.0, (self.top + rows) / count))
+        else:
+            self.scrollbar.set(0.0, 1.0)
 
 
 class StockApp:
     def __init__(self):
-        self.stock_list = []
-        if path.exists("stocks.db") == False:
-            stock_data.create_database()
+        self.stock_list = Portfolio()
+        stock_data.create_database()
 
         self.root = Tk()
         self.root.title("(myname) Stock Manager")
@@ -33,6 +286,7 @@ class StockApp:
         self.webmenu = Menu(self.menubar, tearoff=0)
         self.webmenu.add_command(label="Scrape Data from Yahoo! Finance...", command=self.scrape_web_data)
         self.webmenu.add_command(label="Import CSV From Yahoo! Finance...", command=self.importCSV_web_data)
+        self.webmenu.add_command(label="Import Folder of Yahoo! Finance CSVs...", command=self.importCSV_folder)
         self.menubar.add_cascade(label="Web", menu=self.webmenu)
 
         chartmenu = Menu(self.menubar, tearoff=0)
@@ -113,19 +367,18 @@ class StockApp:
         self.headingLabel = Label(right_frame, text="Select a stock to view history", font=("Helvetica", 12, "bold"))
         self.headingLabel.grid(row=0, column=0, sticky="w")
 
-        notebook = ttk.Notebook(right_frame)
-        notebook.grid(row=1, column=0, sticky="nsew", pady=(5, 0))
+        self.notebook = ttk.Notebook(right_frame)
+        self.notebook.grid(row=1, column=0, sticky="nsew", pady=(5, 0))
 
-        history_frame = Frame(notebook)
-        report_frame = Frame(notebook)
-        notebook.add(history_frame, text="History")
-        notebook.add(report_frame, text="Report")
+        history_frame = Frame(self.notebook)
+        report_frame = Frame(self.notebook)
+        self.stockChart = StockChart(self.notebook)
+        self.notebook.add(history_frame, text="History")
+        self.notebook.add(report_frame, text="Report")
+        self.notebook.add(self.stockChart, text="Chart")
 
-        self.dailyDataList = Text(history_frame, wrap=NONE)
-        history_scroll = Scrollbar(history_frame, orient=VERTICAL, command=self.dailyDataList.yview)
-        self.dailyDataList.configure(yscrollcommand=history_scroll.set)
-        self.dailyDataList.pack(side=LEFT, fill=BOTH, expand=True)
-        history_scroll.pack(side=RIGHT, fill=Y)
+        self.dailyDataList = HistoryTable(history_frame)
+        self.dailyDataList.pack(fill=BOTH, expand=True)
 
         self.stockReport = Text(report_frame, wrap=WORD)
         report_scroll = Scrollbar(report_frame, orient=VERTICAL, command=self.stockReport.yview)
@@ -133,28 +386,107 @@ class StockApp:
         self.stockReport.pack(side=LEFT, fill=BOTH, expand=True)
         report_scroll.pack(side=RIGHT, fill=Y)
 
+        status_frame = Frame(self.root, padx=10, pady=4)
+        status_frame.grid(row=1, column=0, sticky="ew")
+        status_frame.columnconfigure(0, weight=1)
+        self.statusLabel = Label(status_frame, text="Ready", anchor="w")
+        self.statusLabel.grid(row=0, column=0, sticky="ew")
+        self.progressBar = ttk.Progressbar(status_frame, length=200, mode="determinate")
+        self.progressBar.grid(row=0, column=1, padx=6)
+        self.cancelButton = Button(status_frame, text="Cancel", state=DISABLED, command=self.cancel_task)
+        self.cancelButton.grid(row=0, column=2)
+
+        self.tasks = TaskRunner(self.root, on_idle=self._tasks_idle)
+
         self.root.mainloop()
+        self.tasks.close()
 
     def refresh_stock_list(self):
         self.stockList.delete(0, END)
-        sortStocks(self.stock_list)
         for stock in self.stock_list:
             self.stockList.insert(END, stock.symbol)
 
-    def load(self):
-        self.stockList.delete(0, END)
-        stock_data.load_stock_data(self.stock_list)
+    # True (after telling the user) while a background task runs. Tasks only change stocks from this
+    # thread, but a load or import replaces or reloads them when it finishes, so edits wait until then.
+    def _busy(self, title):
+        if self.tasks.busy():
+            messagebox.showwarning(title, "Wait for the current operation to finish or cancel it.")
+            return True
+        return False
+
+    # Start a background task unless one is already running; returns the Task or None.
+    # work runs on a worker thread and must not touch the stocks; it passes data back to
+    # on_progress/on_done, which run on this thread and apply it.
+    def _start_task(self, title, status, work, on_progress=None, on_done=None, on_error=None, maximum=0):
+        if self._busy(title):
+            return None
+        self.statusLabel['text'] = status
+        self.progressBar.configure(mode="determinate" if maximum else "indeterminate", maximum=maximum or 100, value=0)
+        if not maximum:
+            self.progressBar.start()
+        self.cancelButton.config(state=NORMAL)
+        return self.tasks.run(title, work, on_progress, on_done, on_error)
+
+    def _tasks_idle(self):
+        self.progressBar.stop()
+        self.progressBar.configure(mode="determinate", value=0)
+        self.cancelButton.config(state=DISABLED)
+
+    def cancel_task(self):
+        self.tasks.cancel_all()
+        self.statusLabel['text'] = "Cancelling..."
+
+    # Put a newly loaded portfolio in place of the current one, keeping the selected symbol if it is still there
+    def _replace_portfolio(self, portfolio):
+        selected = self._get_selected_stock()
+        self.stock_list = portfolio
         self.refresh_stock_list()
         if self.stock_list:
-            self.stockList.selection_set(0)
-        messagebox.showinfo("Load Data", "Data Loaded")
+            index = self.stock_list.index(selected.symbol) if selected and selected.symbol in self.stock_list else 0
+            self.stockList.selection_set(index)
+            self.stockList.see(index)
         self.display_stock_data()
 
+    def load(self):
+        if self._busy("Load Data"):
+            return
+
+        def work(task):
+            portfolio = Portfolio()
+            stock_data.load_stock_data(portfolio, lazy=True)
+            return portfolio
+
+        def done(portfolio):
+            self._replace_portfolio(portfolio)
+            self.statusLabel['text'] = f"Loaded {len(portfolio)} stocks"
+            messagebox.showinfo("Load Data", "Data Loaded")
+
+        self._start_task("Load Data", "Loading...", work, on_done=done, on_error=self._task_failed("Load Data"))
+
     def save(self):
-        stock_data.save_stock_data(self.stock_list)
-        messagebox.showinfo("Save Data", "Data Saved")
+        if self._busy("Save Data"):
+            return
+        # the worker writes a copy; stocks are marked saved back on this thread, unless changed meanwhile
+        snapshot = stock_data.stock_snapshot(self.stock_list)
+
+        def done(result):
+            stock_data.mark_snapshot_saved(snapshot)
+            self.statusLabel['text'] = "Data Saved"
+            messagebox.showinfo("Save Data", "Data Saved")
+
+        self._start_task("Save Data", "Saving...", lambda task: stock_data.write_stock_snapshot(snapshot),
+                         on_done=done, on_error=self._task_failed("Save Data"))
+
+    # Error handler for a task: show the error and reset the status line
+    def _task_failed(self, title, message=None):
+        def failed(err):
+            self.statusLabel['text'] = f"{title} failed"
+            messagebox.showerror(title, message or str(err))
+        return failed
 
     def add_stock(self):
+        if self._busy("Add Stock"):
+            return
         symbol = self.addSymbolEntry.get().strip().upper()
         name = self.addNameEntry.get().strip()
         shares_input = self.addSharesEntry.get().strip()
@@ -166,13 +498,13 @@ class StockApp:
         except ValueError:
             messagebox.showerror("Add Stock", "Shares must be a number.")
             return
-        if any(stock.symbol.upper() == symbol for stock in self.stock_list):
+        if symbol in self.stock_list:
             messagebox.showwarning("Add Stock", f"{symbol} already exists.")
             return
         new_stock = Stock(symbol, name, shares)
         self.stock_list.append(new_stock)
         self.refresh_stock_list()
-        index = next((idx for idx, stock in enumerate(self.stock_list) if stock.symbol == symbol), 0)
+        index = self.stock_list.index(new_stock)
         self.stockList.selection_clear(0, END)
         self.stockList.selection_set(index)
         self.stockList.see(index)
@@ -183,6 +515,8 @@ class StockApp:
         messagebox.showinfo("Add Stock", f"{symbol} added to portfolio.")
 
     def buy_shares(self):
+        if self._busy("Buy Shares"):
+            return
         stock = self._get_selected_stock()
         if not stock:
             messagebox.showwarning("Buy Shares", "Select a stock first.")
@@ -202,6 +536,8 @@ class StockApp:
         messagebox.showinfo("Buy Shares", "Shares Purchased")
 
     def sell_shares(self):
+        if self._busy("Sell Shares"):
+            return
         stock = self._get_selected_stock()
         if not stock:
             messagebox.showwarning("Sell Shares", "Select a stock first.")
@@ -221,6 +557,8 @@ class StockApp:
         messagebox.showinfo("Sell Shares", "Shares Sold")
 
     def delete_stock(self):
+        if self._busy("Delete Stock"):
+            return
         stock = self._get_selected_stock()
         if not stock:
             messagebox.showwarning("Delete Stock", "Select a stock to remove.")
@@ -231,6 +569,8 @@ class StockApp:
         messagebox.showinfo("Delete Stock", f"{stock.symbol} removed from portfolio.")
 
     def add_daily_data(self):
+        if self._busy("Add Daily Data"):
+            return
         stock = self._get_selected_stock()
         if not stock:
             messagebox.showwarning("Add Daily Data", "Select a stock first.")
@@ -246,7 +586,6 @@ class StockApp:
             messagebox.showerror("Add Daily Data", "Check date, price, and volume formats.")
             return
         stock.add_data(DailyData(date_value, price_value, volume_value))
-        sortDailyData(self.stock_list)
         self.dailyDateEntry.delete(0, END)
         self.dailyPriceEntry.delete(0, END)
         self.dailyVolumeEntry.delete(0, END)
@@ -254,8 +593,8 @@ class StockApp:
         messagebox.showinfo("Add Daily Data", "Data Saved")
 
     def refresh_daily_display(self):
-        self.dailyDataList.config(state=NORMAL)
-        self.dailyDataList.delete("1.0", END)
+        self.dailyDataList.clear()
+        self.stockChart.clear()
         self.stockReport.config(state=NORMAL)
         self.stockReport.delete("1.0", END)
 
@@ -264,41 +603,30 @@ class StockApp:
         selection = self.stockList.curselection()
         if not selection:
             self.headingLabel['text'] = "Select a stock to view history"
-            self.dailyDataList.config(state=DISABLED)
             self.stockReport.config(state=DISABLED)
             return
         symbol = self.stockList.get(selection[0])
-        stock = next((stk for stk in self.stock_list if stk.symbol == symbol), None)
+        stock = self.stock_list.get(symbol)
         if not stock:
             self.headingLabel['text'] = "Select a stock to view history"
-            self.dailyDataList.config(state=DISABLED)
             self.stockReport.config(state=DISABLED)
             return
-        sortDailyData([stock])
         self.headingLabel['text'] = stock.name + " - " + str(stock.shares) + " Shares"
         if not stock.DataList:
-            self.dailyDataList.insert(END, "No history available.\n")
             self.stockReport.insert(END, "No historical data has been recorded for this stock.")
-            self.dailyDataList.config(state=DISABLED)
             self.stockReport.config(state=DISABLED)
             return
-        self.dailyDataList.insert(END, "- Date -      - Price -    - Volume -\n")
-        self.dailyDataList.insert(END, "----------------------------------------\n")
-        for daily_data in stock.DataList:
-            row = f"{daily_data.date.strftime('%m/%d/%y')}   {'${:,.2f}'.format(daily_data.close)}   {int(daily_data.volume):,}\n"
-            self.dailyDataList.insert(END, row)
-        closes = [data.close for data in stock.DataList]
-        volumes = [data.volume for data in stock.DataList]
-        latest = stock.DataList[-1]
-        self.stockReport.insert(END, f"Records: {len(stock.DataList)}\n")
-        self.stockReport.insert(END, f"Latest: {latest.date.strftime('%m/%d/%y')} @ ${latest.close:,.2f}\n")
-        self.stockReport.insert(END, f"Close Range: ${min(closes):,.2f} - ${max(closes):,.2f}\n")
-        self.stockReport.insert(END, f"Avg Close: ${sum(closes)/len(closes):,.2f}\n")
-        self.stockReport.insert(END, f"Total Volume: {int(sum(volumes)):,}\n")
-        profit_loss = stock.profit_loss()
-        percent = stock.profit_loss_percent()
-        self.stockReport.insert(END, f"Profit/Loss: ${profit_loss:,.2f} ({percent:+.2f}%)\n")
-        self.dailyDataList.config(state=DISABLED)
+        self.dailyDataList.show(stock.DataList)
+        self.stockChart.show(stock)
+        summary = stock.summary()
+        self.stockReport.insert(END, f"Records: {summary['count']}\n")
+        self.stockReport.insert(END, f"Latest: {summary['last_date'].strftime('%m/%d/%y')} @ ${summary['last_close']:,.2f}\n")
+        self.stockReport.insert(END, f"Close Range: ${summary['min_close']:,.2f} - ${summary['max_close']:,.2f}\n")
+        self.stockReport.insert(END, f"Avg Close: ${summary['avg_close']:,.2f}\n")
+        self.stockReport.insert(END, f"Total Volume: {int(summary['total_volume']):,}\n")
+        self.stockReport.insert(END, f"Profit/Loss: ${summary['profit_loss']:,.2f} ({summary['profit_loss_percent']:+.2f}%)\n")
+        for line in indicators.report_lines(stock):
+            self.stockReport.insert(END, line + "\n")
         self.stockReport.config(state=DISABLED)
 
     def update_data(self, evt):
@@ -309,7 +637,10 @@ class StockApp:
         if not stock:
             messagebox.showwarning("Display Chart", "Select a stock before showing a chart.")
             return
-        display_stock_chart(self.stock_list, stock.symbol)
+        if not stock.DataList:
+            messagebox.showwarning("Display Chart", "No historical data to chart for " + stock.symbol)
+            return
+        self.notebook.select(self.stockChart)
 
     def scrape_web_data(self):
         if not self.stock_list:
@@ -321,15 +652,60 @@ class StockApp:
         dateTo = simpledialog.askstring("Ending Date", "Enter Ending Date (m/d/yy)")
         if not dateTo:
             return
-        try:
-            stock_data.retrieve_stock_web(dateFrom, dateTo, self.stock_list)
-            sortDailyData(self.stock_list)
+        if self._busy("Get Data From Web"):
+            return
+        stocks = list(self.stock_list)
+        # what each stock already has is read here; the worker only downloads and parses
+        spans = stock_data.stored_date_spans(stocks)
+        finished = []
+        fetched = []   # seconds each page took to download
+        cached = []
+
+        # rows come back as ("rows", stock, rows), followed by ("page", symbol, count, seconds, cached)
+        def work(task):
+            return stock_data.retrieve_stock_web(dateFrom, dateTo, stocks, incremental=True, spans=spans,
+                                                 cancel=task.cancel_event,
+                                                 apply=lambda stock, rows: task.report("rows", stock, rows),
+                                                 progress=lambda *page: task.report("page", *page))
+
+        # each page's rows are added here, and the symbol is refreshed on screen if it is selected;
+        # the status line shows how long each page took or that it came from the cache
+        def progress(kind, *details):
+            if kind == "rows":
+                stock, rows = details
+                for daily_data in rows:
+                    stock.add_data(daily_data)
+                if self._get_selected_stock() is stock:
+                    self.display_stock_data()
+                return
+            symbol, count, seconds, from_cache = details
+            finished.append(symbol)
+            (cached if from_cache else fetched).append(seconds)
+            source = "from cache" if from_cache else f"in {seconds:.2f}s"
+            self.progressBar['value'] = min(len(finished), len(stocks))
+            self.statusLabel['text'] = (f"{symbol}: {count} records {source} ({len(finished)} of {len(stocks)}, "
+                                        f"{len(cached)} cached)")
+
+        def done(records):
             self.display_stock_data()
-            messagebox.showinfo("Get Data From Web", "Data Retrieved")
-        except RuntimeWarning:
-            messagebox.showerror("Cannot Get Data from Web", "Check Path for Chrome Driver")
-        except Exception:
-            messagebox.showerror("Cannot Get Data from Web", "Unable to reach Yahoo! Finance.")
+            average = f", {sum(fetched) / len(fetched):.2f}s per page" if fetched else ""
+            pages = f"{len(fetched)} downloaded, {len(cached)} from cache{average}"
+            if task.cancelled:
+                self.statusLabel['text'] = f"Cancelled after {records} records ({pages})"
+            else:
+                self.statusLabel['text'] = f"Retrieved {records} records ({pages})"
+                messagebox.showinfo("Get Data From Web", "Data Retrieved")
+
+        def failed(err):
+            self.display_stock_data()
+            self.statusLabel['text'] = "Get Data From Web failed"
+            if isinstance(err, RuntimeWarning):
+                # a missing Chrome driver or a page the server refused
+                messagebox.showerror("Cannot Get Data from Web", str(err))
+            else:
+                messagebox.showerror("Cannot Get Data from Web", "Unable to reach Yahoo! Finance.")
+
+        task = self._start_task("Get Data From Web", "Retrieving...", work, progress, done, failed, maximum=len(stocks))
 
     def importCSV_web_data(self):
         selection = self.stockList.curselection()
@@ -340,22 +716,87 @@ class StockApp:
         filename = filedialog.askopenfilename(title="Select " + symbol + " File to Import", filetypes=[('Yahoo Finance! CSV', '*.csv')])
         if not filename:
             return
-        try:
-            stock_data.import_stock_web_csv(self.stock_list, symbol, filename)
-            sortDailyData(self.stock_list)
+        if self._busy("Import CSV"):
+            return
+        stock = self._get_selected_stock()
+        loaded = stock.history_loaded
+        # the stock is saved first (so it is in the database with its name and shares, and its own unsaved
+        # bars are kept) from a copy taken here; other stocks are untouched
+        snapshot = stock_data.stock_snapshot([stock])
+        saved = threading.Event()
+
+        # save the stock, then stream the file into the database and read the stock's new history back;
+        # it is put in place here
+        def work(task):
+            stock_data.write_stock_snapshot(snapshot)
+            saved.set()
+            records = stock_data.stream_csv_to_database(filename, symbol, cancel=task.cancel_event,
+                                                        progress=lambda rows, done, total: task.report(rows, done, total))
+            return records, stock_data.read_history_columns(stock.symbol) if loaded else None
+
+        def progress(rows, bytes_read, total_bytes):
+            self.progressBar['value'] = 100 * bytes_read / total_bytes if total_bytes else 100
+            self.statusLabel['text'] = f"Importing {symbol}... {rows:,} rows ({bytes_read / total_bytes:.0%})"
+
+        def done(result):
+            records, columns = result
+            stock_data.reload_history(stock, columns)
             self.display_stock_data()
-            messagebox.showinfo("Import Complete", symbol + " Import Complete")
-        except FileNotFoundError:
-            messagebox.showerror("Import CSV", "File not found.")
-        except Exception as err:
-            messagebox.showerror("Import CSV", str(err))
+            if task.cancelled:
+                self.statusLabel['text'] = f"{symbol} import cancelled after {records:,} records"
+            else:
+                self.statusLabel['text'] = f"Imported {records:,} records for {symbol}"
+                messagebox.showinfo("Import Complete", symbol + " Import Complete")
+
+        def failed(err):
+            if saved.is_set():
+                stock_data.reload_history(stock) # chunks written before the error are in the database
+            self.display_stock_data()
+            self.statusLabel['text'] = "Import CSV failed"
+            messagebox.showerror("Import CSV", "File not found." if isinstance(err, FileNotFoundError) else str(err))
+
+        task = self._start_task("Import CSV", f"Importing {symbol}...", work, progress, done, failed, maximum=100)
+
+    def importCSV_folder(self):
+        directory = filedialog.askdirectory(title="Select Folder of <SYMBOL>_yahoo.csv Files")
+        if not directory:
+            return
+        if self._busy("Import Folder"):
+            return
+        # unsaved changes are written first (from a copy), since the portfolio is reloaded afterwards
+        snapshot = stock_data.stock_snapshot(self.stock_list)
+        imported = []
+
+        def work(task):
+            stock_data.write_stock_snapshot(snapshot)
+            file_count, records = stock_data.import_stock_csv_directory(
+                directory, cancel=task.cancel_event, progress=lambda symbol, count: task.report(symbol, count))
+            portfolio = Portfolio()
+            stock_data.load_stock_data(portfolio, lazy=True)
+            return portfolio, file_count, records
+
+        def progress(symbol, count):
+            imported.append(symbol)
+            self.statusLabel['text'] = f"{symbol}: {count} records ({len(imported)} files)"
+
+        def done(result):
+            portfolio, file_count, records = result
+            self._replace_portfolio(portfolio)
+            if task.cancelled:
+                self.statusLabel['text'] = f"Import cancelled after {len(imported)} files"
+            else:
+                self.statusLabel['text'] = f"Imported {records} records from {file_count} files"
+                messagebox.showinfo("Import Complete", f"Imported {records} records from {file_count} files.")
+
+        task = self._start_task("Import Folder", "Importing folder...", work, progress, done,
+                                self._task_failed("Import Folder"))
 
     def _get_selected_stock(self):
         selection = self.stockList.curselection()
         if not selection:
             return None
         symbol = self.stockList.get(selection[0])
-        return next((stock for stock in self.stock_list if stock.symbol == symbol), None)
+        return self.stock_list.get(symbol)
 
 
 def main():
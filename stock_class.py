@@ -1,14 +1,48 @@
 # Summary: This module contains the class definitions that will be used in the stock analysis program
 
+import math
+from array import array
+from bisect import bisect_left, bisect_right, insort
 from datetime import datetime
 
 
 class Stock:
-    def __init__(self, symbol, name, shares):
+    # history_source, when given, loads the daily history on first use of DataList
+    # (see stock_data.HistoryCache) and may later unload it again to bound memory.
+    def __init__(self, symbol, name, shares, history_source=None):
         self._symbol = symbol
         self._name = name
         self._shares = shares
-        self.DataList = [] # list of daily stock data
+        self._history_source = history_source
+        self._data = None if history_source else PriceSeries() # columnar daily stock data
+        self._history_modified = False
+
+    @property
+    def DataList(self):
+        if self._history_source is not None:
+            if self._data is None:
+                self._data = self._history_source.load(self)
+            else:
+                self._history_source.touch(self)
+        return self._data
+
+    # True if the daily history is in memory (always True for stocks without a history source)
+    @property
+    def history_loaded(self):
+        return self._data is not None
+
+    # True if data was added since the history was loaded or last saved
+    @property
+    def history_modified(self):
+        return self._history_modified
+
+    def mark_history_saved(self):
+        self._history_modified = False
+
+    # Drop an unmodified, lazily loaded history; it is reloaded on next access
+    def unload_history(self):
+        if self._history_source is not None and not self._history_modified:
+            self._data = None
 
     @property
     def symbol(self):
@@ -37,30 +71,392 @@ class Stock:
     def sell(self, shares):
        self._shares = self._shares - shares
        
-    # Add daily stock data
+    # Add daily stock data; a bar for a date already held replaces it
     def add_data(self, stock_data):
         self.DataList.append(stock_data)
+        self._history_modified = True
+
+    # Add many bars at once from parallel sequences of date ordinals, closes and volumes
+    def add_bars(self, ordinals, closes, volumes):
+        self.DataList.extend(ordinals, closes, volumes)
+        self._history_modified = True
 
-    def profit_loss(self):
-        if not self.DataList:
+    # Bars dated from start to end (dates or datetimes, both inclusive; None leaves that side open),
+    # as a view over the history found by binary search, without copying any bars
+    def window(self, start=None, end=None):
+        return self.DataList.window(start.toordinal() if start else None, end.toordinal() if end else None)
+
+    # Bars from the last n_days calendar days, counting back from the newest bar
+    def last(self, n_days):
+        dates = self.DataList.dates
+        if not dates:
+            return self.DataList.window()
+        return self.DataList.window(dates[-1] - n_days + 1, None)
+
+    # Closing prices of the oldest and newest bars in the range (the history is kept in date order)
+    def _first_last_close(self, start=None, end=None):
+        bars = self.window(start, end) if start or end else self.DataList
+        if not bars:
+            return None
+        closes = bars.closes
+        return closes[0], closes[-1]
+
+    def profit_loss(self, start=None, end=None):
+        first_last = self._first_last_close(start, end)
+        if not first_last:
             return 0.0
-        sorted_data = sorted(self.DataList, key=lambda data: data.date)
-        start_price = sorted_data[0].close
-        latest_price = sorted_data[-1].close
+        start_price, latest_price = first_last
         return (latest_price - start_price) * self._shares
 
-    def profit_loss_percent(self):
-        if not self.DataList:
+    def profit_loss_percent(self, start=None, end=None):
+        first_last = self._first_last_close(start, end)
+        if not first_last:
             return 0.0
-        sorted_data = sorted(self.DataList, key=lambda data: data.date)
-        start_price = sorted_data[0].close
+        start_price, latest_price = first_last
         if start_price == 0:
             return 0.0
-        latest_price = sorted_data[-1].close
         return ((latest_price - start_price) / start_price) * 100
-    
+
+    # Summary of the daily history from running totals kept as bars are added, or None if there is no history:
+    # count, first/last date and close, min/max/average close, total volume, profit/loss and percent
+    def summary(self):
+        summary = self.DataList.summary()
+        if summary is None:
+            return None
+        summary["profit_loss"] = self.profit_loss()
+        summary["profit_loss_percent"] = self.profit_loss_percent()
+        return summary
+
+
+# The stocks being tracked, kept in symbol order with a dict index for case-insensitive
+# lookup by symbol. It can be used like the list of Stock objects it replaces: iteration,
+# len(), indexing, append(), remove(), del, clear() and sort() all work, and sort() has
+# nothing to do because stocks are placed in order as they are added.
+class Portfolio:
+    def __init__(self, stocks=()):
+        self._stocks = []   # Stock objects ordered by upper-case symbol
+        self._index = {}    # upper-case symbol -> Stock
+        self.extend(stocks)
+
+    @staticmethod
+    def _key(stock):
+        return stock.symbol.upper()
+
+    # The stock with this symbol (any case), or default
+    def get(self, symbol, default=None):
+        return self._index.get(symbol.upper(), default)
+
+    def symbols(self):
+        return [stock.symbol for stock in self._stocks]
+
+    def append(self, stock):
+        key = self._key(stock)
+        if key in self._index:
+            raise RuntimeWarning(f"Stock {stock.symbol} is already in the portfolio.")
+        if not self._stocks or key > self._key(self._stocks[-1]):
+            self._stocks.append(stock)
+        else:
+            insort(self._stocks, stock, key=self._key)
+        self._index[key] = stock
+
+    def extend(self, stocks):
+        for stock in stocks:
+            self.append(stock)
+
+    # Position of a stock (or symbol) in symbol order
+    def index(self, stock):
+        key = stock.upper() if isinstance(stock, str) else self._key(stock)
+        if key in self._index:
+            position = bisect_left(self._stocks, key, key=self._key)
+            if position < len(self._stocks) and self._stocks[position] is self._index[key]:
+                return position
+        raise ValueError(f"{stock!r} is not in the portfolio")
+
+    def remove(self, stock):
+        del self[self.index(stock)]
+
+    # Remove and return the stock with this symbol, or None if it is not tracked
+    def delete(self, symbol):
+        stock = self.get(symbol)
+        if stock is not None:
+            self.remove(stock)
+        return stock
+
+    def pop(self, index=-1):
+        stock = self._stocks[index]
+        del self[index]
+        return stock
+
+    def clear(self):
+        self._stocks.clear()
+        self._index.clear()
+
+    # Stocks are always in symbol order; kept so code written for a list still runs
+    def sort(self, key=None, reverse=False):
+        pass
+
+    def __len__(self):
+        return len(self._stocks)
+
+    def __iter__(self):
+        return iter(self._stocks)
+
+    def __getitem__(self, index):
+        return self._stocks[index]
+
+    def __delitem__(self, index):
+        removed = self._stocks[index]
+        del self._stocks[index]
+        for stock in (removed if isinstance(index, slice) else [removed]):
+            del self._index[self._key(stock)]
+
+    # True for a Stock in the portfolio or a tracked symbol (any case)
+    def __contains__(self, item):
+        if isinstance(item, str):
+            return item.upper() in self._index
+        return self._index.get(self._key(item)) is item
+
+    def __repr__(self):
+        return f"Portfolio({self._stocks!r})"
+
+
+# The stock with this symbol (any case) in a Portfolio or a plain list of stocks, or None
+def find_stock(stock_list, symbol):
+    if isinstance(stock_list, Portfolio):
+        return stock_list.get(symbol)
+    symbol = symbol.upper()
+    return next((stock for stock in stock_list if stock.symbol.upper() == symbol), None)
+
+
+# Columnar store for a stock's daily history, one bar per date, oldest to newest.
+# Dates are kept as day ordinals, closes and volumes as doubles, each in one
+# contiguous array, so a long history costs three objects instead of one
+# DailyData (plus a datetime) per bar. Indexing and iteration hand back
+# DailyData rows built on demand, so code written against a list of
+# DailyData keeps working.
+# Running totals (close sum, volume sum, lowest and highest close) are kept up to
+# date as bars are added or replaced, so summary() does not rescan the history;
+# change bars through add()/extend() rather than the arrays so they stay correct.
+# revision counts changes other than appending newer bars (inserts, replacements,
+# merges, clear), so derived data can tell whether it only needs the new bars.
+class PriceSeries:
+    __slots__ = ("dates", "closes", "volumes", "revision", "_close_sum", "_volume_sum", "_low", "_high",
+                 "_extremes_stale", "__weakref__")
+
+    def __init__(self):
+        self.dates = array("l")
+        self.closes = array("d")
+        self.volumes = array("d")
+        self.revision = 0
+        self._reset_totals()
+
+    def _reset_totals(self):
+        self._close_sum = 0.0
+        self._volume_sum = 0.0
+        self._low = None
+        self._high = None
+        self._extremes_stale = False
+
+    # Recompute every running total from the arrays
+    def _recount(self):
+        self._close_sum = math.fsum(self.closes)
+        self._volume_sum = math.fsum(self.volumes)
+        self._low = min(self.closes, default=None)
+        self._high = max(self.closes, default=None)
+        self._extremes_stale = False
+
+    # Fold newly added closes into the lowest and highest close
+    def _widen(self, low, high):
+        if self._low is None or low < self._low:
+            self._low = low
+        if self._high is None or high > self._high:
+            self._high = high
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self.dates)))]
+        return DailyData(datetime.fromordinal(self.dates[index]), self.closes[index], self.volumes[index])
+
+    def __iter__(self):
+        fromordinal = datetime.fromordinal
+        for ordinal, close, volume in zip(self.dates, self.closes, self.volumes):
+            yield DailyData(fromordinal(ordinal), close, volume)
+
+    def append(self, daily_data):
+        self.add(daily_data.date.toordinal(), daily_data.close, daily_data.volume)
+
+    # Add a bar given as (date ordinal, close, volume) without building a DailyData.
+    # Bars stay ordered by date: a newer bar is appended, an older one is inserted at its
+    # place (binary search), and a bar for a date already held replaces the old one.
+    def add(self, ordinal, close, volume):
+        dates = self.dates
+        if not dates or ordinal > dates[-1]:
+            dates.append(ordinal)
+            self.closes.append(close)
+            self.volumes.append(volume)
+        else:
+            self.revision += 1
+            index = bisect_left(dates, ordinal)
+            if dates[index] == ordinal:
+                old_close = self.closes[index]
+                self._close_sum -= old_close
+                self._volume_sum -= self.volumes[index]
+                # a replaced extreme may no longer be the lowest/highest close
+                if old_close == self._low or old_close == self._high:
+                    self._extremes_stale = True
+                self.closes[index] = close
+                self.volumes[index] = volume
+            else:
+                dates.insert(index, ordinal)
+                self.closes.insert(index, close)
+                self.volumes.insert(index, volume)
+        self._close_sum += close
+        self._volume_sum += volume
+        self._widen(close, close)
+
+    # Add many bars from parallel sequences of date ordinals, closes and volumes.
+    # Bars that are in order and newer than the last one held are appended in bulk;
+    # anything else is merged in one pass, later bars replacing earlier ones on the same date.
+    def extend(self, ordinals, closes, volumes):
+        if not ordinals:
+            return
+        last = self.dates[-1] if self.dates else None
+        if (last is None or ordinals[0] > last) and all(a < b for a, b in zip(ordinals, ordinals[1:])):
+            self.dates.extend(ordinals)
+            self.closes.extend(closes)
+            self.volumes.extend(volumes)
+            self._close_sum += math.fsum(closes)
+            self._volume_sum += math.fsum(volumes)
+            self._widen(min(closes), max(closes))
+            return
+        self.revision += 1
+        merged = {}
+        for bar in zip(self.dates, self.closes, self.volumes):
+            merged[bar[0]] = bar
+        for bar in zip(ordinals, closes, volumes):
+            merged[bar[0]] = bar
+        bars = sorted(merged.values())
+        self.dates = array("l", [bar[0] for bar in bars])
+        self.closes = array("d", [bar[1] for bar in bars])
+        self.volumes = array("d", [bar[2] for bar in bars])
+        self._recount()
+
+    def clear(self):
+        del self.dates[:]
+        del self.closes[:]
+        del self.volumes[:]
+        self.revision += 1
+        self._reset_totals()
+
+    # Bars are kept in date order on insert, so this only has work to do if the
+    # date column was modified directly; it then sorts (stable) oldest to newest.
+    def sort(self):
+        dates = self.dates
+        if all(a <= b for a, b in zip(dates, dates[1:])):
+            return
+        self.revision += 1
+        order = sorted(range(len(dates)), key=dates.__getitem__)
+        closes = self.closes
+        volumes = self.volumes
+        self.dates = array("l", [dates[i] for i in order])
+        self.closes = array("d", [closes[i] for i in order])
+        self.volumes = array("d", [volumes[i] for i in order])
+        self._recount()
+
+    # View of the bars dated from start to end (day ordinals, inclusive; None leaves that side open)
+    def window(self, start=None, end=None):
+        dates = self.dates
+        low = bisect_left(dates, start) if start is not None else 0
+        high = bisect_right(dates, end) if end is not None else len(dates)
+        return PriceWindow(self, low, max(low, high))
+
+    # Count, first/last date and close, min/max/average close and total volume, or None if empty.
+    # Only a replaced lowest or highest close costs a rescan (of the closes alone).
+    def summary(self):
+        if not self.dates:
+            return None
+        if self._extremes_stale:
+            self._low = min(self.closes)
+            self._high = max(self.closes)
+            self._extremes_stale = False
+        count = len(self.dates)
+        return {"count": count,
+                "first_date": datetime.fromordinal(self.dates[0]),
+                "last_date": datetime.fromordinal(self.dates[-1]),
+                "first_close": self.closes[0],
+                "last_close": self.closes[-1],
+                "min_close": self._low,
+                "max_close": self._high,
+                "avg_close": self._close_sum / count,
+                "total_volume": self._volume_sum}
+
+
+# Read-only view of a run of bars in a PriceSeries, as returned by PriceSeries.window().
+# It behaves like a list of DailyData; dates, closes and volumes are copies of the window's part of
+# the series' arrays (array slices), so holding them never stops bars being added to the series.
+# The view covers positions, not dates: take a new one after bars are added.
+class PriceWindow:
+    __slots__ = ("_series", "start", "stop")
+
+    def __init__(self, series, start, stop):
+        self._series = series
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("PriceWindow index out of range")
+        return self._series[self.start + index]
+
+    def __iter__(self):
+        series = self._series
+        fromordinal = datetime.fromordinal
+        for i in range(self.start, self.stop):
+            yield DailyData(fromordinal(series.dates[i]), series.closes[i], series.volumes[i])
+
+    @property
+    def dates(self):
+        return self._series.dates[self.start:self.stop]
+
+    @property
+    def closes(self):
+        return self._series.closes[self.start:self.stop]
+
+    @property
+    def volumes(self):
+        return self._series.volumes[self.start:self.stop]
+
+    # Same figures as PriceSeries.summary() for the bars in the window, or None if empty
+    def summary(self):
+        if not len(self):
+            return None
+        dates = self._series.dates
+        closes = self.closes
+        count = len(closes)
+        return {"count": count,
+                "first_date": datetime.fromordinal(dates[self.start]),
+                "last_date": datetime.fromordinal(dates[self.stop - 1]),
+                "first_close": closes[0],
+                "last_close": closes[-1],
+                "min_close": min(closes),
+                "max_close": max(closes),
+                "avg_close": math.fsum(closes) / count,
+                "total_volume": math.fsum(self.volumes)}
+
 
 class DailyData:
+    __slots__ = ("_date", "_close", "_volume")
+
     def __init__(self, date, close, volume):
         self._date = date
         self._close = close
@@ -1,10 +1,13 @@
 # Summary: This module contains the user interface and logic for a console-based version of the stock manager program.
 
 from datetime import datetime
-from stock_class import Stock, DailyData
-from utilities import clear_screen, display_stock_chart, sortStocks, sortDailyData
+from stock_class import Stock, DailyData, Portfolio
+from utilities import clear_screen, display_stock_chart
 from os import path
 import stock_data
+import indicators
+import analytics
+import stock_report
 
 
 # Main Menu
@@ -89,8 +92,7 @@ def add_stock(stock_list):
         print("Symbol cannot be blank.")
         input("Press Enter to continue...")
         return
-    existing = next((stock for stock in stock_list if stock.symbol.upper() == symbol), None)
-    if existing:
+    if symbol in stock_list:
         print(f"Stock {symbol} already exists.")
         input("Press Enter to continue...")
         return
@@ -104,7 +106,6 @@ def add_stock(stock_list):
         return
     new_stock = Stock(symbol, name, shares)
     stock_list.append(new_stock)
-    sortStocks(stock_list)
     print(f"{symbol} added to portfolio.")
     input("Press Enter to continue...")
 
@@ -144,7 +145,7 @@ def buy_stock(stock_list):
         input("Press Enter to continue...")
         return
     symbol = input("Enter Symbol: ").strip().upper()
-    stock = next((stk for stk in stock_list if stk.symbol.upper() == symbol), None)
+    stock = stock_list.get(symbol)
     if not stock:
         print(f"{symbol} is not in the portfolio.")
         input("Press Enter to continue...")
@@ -174,7 +175,7 @@ def sell_stock(stock_list):
         input("Press Enter to continue...")
         return
     symbol = input("Enter Symbol: ").strip().upper()
-    stock = next((stk for stk in stock_list if stk.symbol.upper() == symbol), None)
+    stock = stock_list.get(symbol)
     if not stock:
         print(f"{symbol} is not in the portfolio.")
         input("Press Enter to continue...")
@@ -204,13 +205,10 @@ def delete_stock(stock_list):
         input("Press Enter to continue...")
         return
     symbol = input("Enter Symbol to Remove: ").strip().upper()
-    for idx, stock in enumerate(stock_list):
-        if stock.symbol.upper() == symbol:
-            del stock_list[idx]
-            print(f"{symbol} removed from portfolio.")
-            input("Press Enter to continue...")
-            return
-    print(f"{symbol} not found.")
+    if stock_list.delete(symbol):
+        print(f"{symbol} removed from portfolio.")
+    else:
+        print(f"{symbol} not found.")
     input("Press Enter to continue...")
 
 
@@ -221,7 +219,6 @@ def list_stocks(stock_list):
     if not stock_list:
         print("No stocks being tracked.")
     else:
-        sortStocks(stock_list)
         for stock in stock_list:
             print(f"{stock.symbol}: {stock.name} - {stock.shares} shares ({len(stock.DataList)} data points)")
     input("Press Enter to continue...")
@@ -236,7 +233,7 @@ def add_stock_data(stock_list):
         input("Press Enter to continue...")
         return
     symbol = input("Enter Symbol to Add Data For: ").strip().upper()
-    stock = next((stk for stk in stock_list if stk.symbol.upper() == symbol), None)
+    stock = stock_list.get(symbol)
     if not stock:
         print(f"{symbol} is not tracked.")
         input("Press Enter to continue...")
@@ -253,7 +250,6 @@ def add_stock_data(stock_list):
         input("Press Enter to continue...")
         return
     stock.add_data(DailyData(date_value, price, volume))
-    sortDailyData(stock_list)
     print("Daily data added.")
     input("Press Enter to continue...")
 
@@ -265,21 +261,24 @@ def display_report(stock_list):
     if not stock_list:
         print("No stocks to report.")
     else:
-        sortDailyData(stock_list)
         for stock in stock_list:
             print(f"{stock.symbol} ({stock.name}) - {stock.shares} shares")
-            if not stock.DataList:
+            row = stock_report.report_row(stock)
+            if not row["records"]:
                 print("    No historical data.")
                 continue
-            closes = [data.close for data in stock.DataList]
-            volumes = [data.volume for data in stock.DataList]
-            latest = stock.DataList[-1]
-            print(f"    Records: {len(stock.DataList)}  Latest: {latest.date.strftime('%m/%d/%y')} {latest.close:.2f}")
-            print(f"    Close Range: {min(closes):.2f} - {max(closes):.2f}  Avg Close: {sum(closes)/len(closes):.2f}")
-            print(f"    Total Volume: {sum(volumes):,.0f}")
-            profit_loss = stock.profit_loss()
-            percent = stock.profit_loss_percent()
-            print(f"    Profit/Loss: ${profit_loss:,.2f} ({percent:+.2f}%)")
+            latest_date = datetime.strptime(row['latest_date'], "%Y-%m-%d").strftime('%m/%d/%y')
+            print(f"    Records: {row['records']}  Latest: {latest_date} {row['latest_close']:.2f}")
+            print(f"    Close Range: {row['min_close']:.2f} - {row['max_close']:.2f}  Avg Close: {row['avg_close']:.2f}")
+            print(f"    Total Volume: {row['total_volume']:,.0f}")
+            print(f"    Profit/Loss: ${row['profit_loss']:,.2f} ({row['profit_loss_percent']:+.2f}%)")
+            for line in indicators.report_lines(stock):
+                print(f"    {line}")
+        portfolio_lines = analytics.report_lines(stock_list)
+        if portfolio_lines:
+            print("Portfolio ---")
+            for line in portfolio_lines:
+                print(f"    {line}")
     input("Press Enter to continue...")
 
 
@@ -291,7 +290,6 @@ def display_chart(stock_list):
         return
     clear_screen()
     print("Available Stocks:")
-    sortStocks(stock_list)
     for stock in stock_list:
         print(f"{stock.symbol} - {stock.name}")
     symbol = input("Enter Symbol to Chart: ").strip()
@@ -299,7 +297,16 @@ def display_chart(stock_list):
         print("No symbol entered.")
         input("Press Enter to continue...")
         return
-    display_stock_chart(stock_list, symbol)
+    start_input = input("Start Date (m/d/yy, Enter for all history): ").strip()
+    end_input = input("End Date (m/d/yy, Enter for latest): ").strip()
+    try:
+        start = datetime.strptime(start_input, "%m/%d/%y") if start_input else None
+        end = datetime.strptime(end_input, "%m/%d/%y") if end_input else None
+    except ValueError:
+        print("Invalid date entered.")
+        input("Press Enter to continue...")
+        return
+    display_stock_chart(stock_list, symbol, start, end)
 
 
 # Manage Data Menu
@@ -312,31 +319,37 @@ def manage_data(stock_list):
         print("2 - Load Data")
         print("3 - Retrieve Data from Web")
         print("4 - Import from CSV File")
+        print("5 - Import Folder of CSV Files")
         print("0 - Exit Manage Data")
         option = input("Enter Menu Option: ").strip()
-        while option not in ["1", "2", "3", "4", "0"]:
+        while option not in ["1", "2", "3", "4", "5", "0"]:
             clear_screen()
             print("*** Invalid Option - Try again ***")
             print("1 - Save Data")
             print("2 - Load Data")
             print("3 - Retrieve Data from Web")
             print("4 - Import from CSV File")
+            print("5 - Import Folder of CSV Files")
             print("0 - Exit Manage Data")
             option = input("Enter Menu Option: ").strip()
         if option == "1":
-            stock_data.save_stock_data(stock_list)
-            print("Data saved.")
+            try:
+                stock_data.save_stock_data(stock_list)
+                print("Data saved.")
+            except RuntimeWarning as err:
+                print(err)
             input("Press Enter to continue...")
         elif option == "2":
             stock_list.clear()
-            stock_data.load_stock_data(stock_list)
-            sortStocks(stock_list)
+            stock_data.load_stock_data(stock_list, lazy=True)
             print("Data loaded.")
             input("Press Enter to continue...")
         elif option == "3":
             retrieve_from_web(stock_list)
         elif option == "4":
             import_csv(stock_list)
+        elif option == "5":
+            import_csv_folder(stock_list)
         else:
             print("Returning to Main Menu")
             input("Press Enter to continue...")
@@ -353,9 +366,14 @@ def retrieve_from_web(stock_list):
     date_start = input("Enter Starting Date (m/d/yy): ").strip()
     date_end = input("Enter Ending Date (m/d/yy): ").strip()
     try:
-        records = stock_data.retrieve_stock_web(date_start, date_end, stock_list)
-        sortDailyData(stock_list)
+        records = stock_data.retrieve_stock_web(date_start, date_end, stock_list, incremental=True,
+                                                progress=lambda symbol, count, seconds, cached: print(f"    {symbol}: {count} records "
+                                                                                                 + ("from cache" if cached else f"in {seconds:.2f}s")))
         print(f"Retrieved {records} records.")
+        cache = stock_data.web_page_cache()
+        if cache:
+            stats = cache.stats()
+            print(f"Cache: {stats['hits']} hits, {stats['misses']} misses.")
     except RuntimeWarning as err:
         print(err)
     except Exception:
@@ -377,10 +395,19 @@ def import_csv(stock_list):
         print("Filename is required.")
         input("Press Enter to continue...")
         return
+    stock = stock_list.get(symbol)
+    if not stock:
+        print(f"{symbol} is not tracked.")
+        input("Press Enter to continue...")
+        return
     try:
-        stock_data.import_stock_web_csv(stock_list, symbol, filename)
-        sortDailyData(stock_list)
-        print(f"CSV data imported for {symbol}.")
+        # save the stock (so it is in the database with its name and shares, and its own unsaved bars are
+        # kept), stream the file into the database, then refresh the stock from it; other stocks are untouched
+        stock_data.save_stock_data([stock])
+        records = stock_data.stream_csv_to_database(filename, stock.symbol,
+                                                    progress=lambda rows, done, total: print(f"    {rows:,} rows ({done / total:.0%})", end="\r"))
+        stock_data.reload_history(stock)
+        print(f"\nCSV data imported for {symbol} ({records:,} records).")
     except FileNotFoundError:
         print("CSV file not found.")
     except Exception as err:
@@ -388,12 +415,32 @@ def import_csv(stock_list):
     input("Press Enter to continue...")
 
 
+# Import every <SYMBOL>_yahoo.csv file in a folder directly into the database, then reload
+def import_csv_folder(stock_list):
+    clear_screen()
+    print("Import Folder of CSV Files ---")
+    directory = input("Enter Folder Containing <SYMBOL>_yahoo.csv Files: ").strip()
+    if not path.isdir(directory):
+        print("Folder not found.")
+        input("Press Enter to continue...")
+        return
+    try:
+        stock_data.save_stock_data(stock_list)
+        file_count, records = stock_data.import_stock_csv_directory(directory)
+        stock_data.load_stock_data(stock_list, lazy=True)
+        print(f"Imported {records} records from {file_count} files.")
+    except RuntimeWarning as err:
+        print(err)
+    except Exception as err:
+        print(f"Unable to import data: {err}")
+    input("Press Enter to continue...")
+
+
 # Begin program
 def main():
-    #check for database, create if not exists
-    if path.exists("stocks.db") == False:
-        stock_data.create_database()
-    stock_list = []
+    #create database if not exists, upgrade it if it uses an older schema
+    stock_data.create_database()
+    stock_list = Portfolio()
     main_menu(stock_list)
 
 
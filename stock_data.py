@@ -1,140 +1,837 @@
 # Summary: This module contains the functions used by both console and GUI programs to manage stock data.
 
 
+import asyncio
+import gzip
+import html
 import sqlite3
+import urllib.request
 from selenium import webdriver
-from selenium.webdriver.common.keys import Keys
-from bs4 import BeautifulSoup
 import re
 import pandas as pd
 import os
+import sys
 import csv
+import multiprocessing
+import queue
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import date, datetime
+from collections import OrderedDict
+from contextlib import nullcontext
+from functools import cache, partial
+from itertools import repeat
 from utilities import clear_screen
-from utilities import sortDailyData
-from stock_class import Stock, DailyData
+import stock_db
+from stock_web_cache import PageCache
+from stock_class import Stock, DailyData, PriceSeries, find_stock
 
-# Create the SQLite database
+# Number of daily histories kept in memory when stocks are loaded lazily
+DEFAULT_MAX_RESIDENT = 64
+
+# Web retrieval settings: backend used by retrieve_stock_web ("selenium" or "http"),
+# headless Chrome sessions / HTTP requests in flight at once, and how long each page may take to load
+WEB_BACKEND = "selenium"
+YAHOO_URL = "https://finance.yahoo.com"
+MAX_BROWSERS = 4
+MAX_CONNECTIONS = 16
+PAGE_LOAD_TIMEOUT = 60
+WEB_CACHE_ENABLED = True
+_web_page_cache = None
+HTTP_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+
+# Start method for worker process pools. Forking a process that already runs threads (the GUI's
+# task worker, the web fetchers) can deadlock on a lock another thread held, so workers start fresh.
+PROCESS_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+# Rows converted and written per transaction by the streaming CSV import
+CSV_CHUNK_ROWS = 100000
+
+# CSV files at least this large are parsed with pandas rather than line by line
+VECTORIZED_CSV_BYTES = 256 * 2**10
+
+# Schema version stored in PRAGMA user_version.
+# Version 1 (user_version 0): dailyData.date is mm/dd/yy TEXT in a rowid table.
+# Version 2: dailyData.date is an INTEGER day ordinal (datetime.toordinal) and the table is
+# clustered on (symbol, date), so per-symbol date ranges are a single primary key range scan.
+SCHEMA_VERSION = 2
+
+createDailyDataTableCmd = """CREATE TABLE IF NOT EXISTS {table} (
+                                symbol TEXT NOT NULL,
+                                date INTEGER NOT NULL,
+                                price REAL NOT NULL,
+                                volume REAL NOT NULL,
+                                PRIMARY KEY (symbol, date)
+                        ) WITHOUT ROWID;"""
+# Covering index for date-range scans across all symbols (e.g. everything traded on a given day)
+createDailyDataDateIndexCmd = """CREATE INDEX IF NOT EXISTS dailyData_date
+                                ON dailyData (date, symbol, price, volume);"""
+
+# Create the SQLite database, or bring an existing one up to the current schema
 def create_database():
-    stockDB = "stocks.db"
-    conn = sqlite3.connect(stockDB)
-    cur = conn.cursor()
     createStockTableCmd = """CREATE TABLE IF NOT EXISTS stocks (
                             symbol TEXT NOT NULL PRIMARY KEY,
                             name TEXT,
                             shares REAL
                         );"""
-    createDailyDataTableCmd = """CREATE TABLE IF NOT EXISTS dailyData (
-                                symbol TEXT NOT NULL,
-                                date TEXT NOT NULL,
-                                price REAL NOT NULL,
-                                volume REAL NOT NULL,
-                                PRIMARY KEY (symbol, date)
-                        );"""   
-    cur.execute(createStockTableCmd)
-    cur.execute(createDailyDataTableCmd)
+    with stock_db.transaction() as conn:
+        conn.execute(createStockTableCmd)
+        dailyDataExists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'dailyData';").fetchone()
+        if not dailyDataExists:
+            conn.execute(createDailyDataTableCmd.format(table="dailyData"))
+            conn.execute(createDailyDataDateIndexCmd)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
+    migrate_database()
+    merge_symbol_case()
 
-# Save stocks and daily data into database
-def save_stock_data(stock_list):
-    stockDB = "stocks.db"
-    conn = sqlite3.connect(stockDB)
-    cur = conn.cursor()
-    insertStockCmd = """INSERT INTO stocks
+# Symbols are stored upper case. Older imports wrote them as given, so a database can hold both
+# AAPL and aapl; fold such rows into the upper-case symbol (its own name, shares and bars win).
+# Returns the number of symbols folded.
+def merge_symbol_case():
+    mixedCaseCmd = "SELECT symbol FROM stocks WHERE symbol != upper(symbol);"
+    mergeStockCmd = """INSERT INTO stocks (symbol, name, shares)
+                        SELECT upper(symbol), name, shares FROM stocks WHERE symbol = ?
+                        ON CONFLICT (symbol) DO NOTHING;"""
+    mergeDailyDataCmd = """INSERT INTO dailyData (symbol, date, price, volume)
+                            SELECT upper(symbol), date, price, volume FROM dailyData WHERE symbol = ?
+                            ON CONFLICT (symbol, date) DO NOTHING;"""
+    with stock_db.transaction() as conn:
+        symbols = [symbol for (symbol,) in conn.execute(mixedCaseCmd)]
+        for symbol in symbols:
+            conn.execute(mergeStockCmd, (symbol,))
+            conn.execute(mergeDailyDataCmd, (symbol,))
+            conn.execute("DELETE FROM dailyData WHERE symbol = ?;", (symbol,))
+            conn.execute("DELETE FROM stocks WHERE symbol = ?;", (symbol,))
+    return len(symbols)
+
+# Upgrade an existing database to the current schema in place.
+# Rows are copied in batches of batch_size so memory use does not depend on the size of the database;
+# the whole upgrade runs in one transaction, so an interrupted migration leaves the old schema intact.
+# Returns the number of daily rows migrated (0 if the database was already current).
+def migrate_database(batch_size=10000, progress=None):
+    insertCmd = """INSERT INTO dailyData_v2
+                    (symbol, date, price, volume)
+                    VALUES
+                    (?, ?, ?, ?)
+                    ON CONFLICT (symbol, date) DO UPDATE SET
+                    price = excluded.price,
+                    volume = excluded.volume;"""
+    migrated = 0
+    with stock_db.transaction() as conn:
+        version = conn.execute("PRAGMA user_version;").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return 0
+        conn.execute("DROP TABLE IF EXISTS dailyData_v2;")
+        conn.execute(createDailyDataTableCmd.format(table="dailyData_v2"))
+        readCur = conn.execute("SELECT symbol, date, price, volume FROM dailyData;")
+        while True:
+            batch = readCur.fetchmany(batch_size)
+            if not batch:
+                break
+            conn.executemany(insertCmd, [(symbol, _text_to_ordinal(date_text), price, volume)
+                                         for symbol, date_text, price, volume in batch])
+            migrated += len(batch)
+            if progress:
+                progress(migrated)
+        conn.execute("DROP TABLE dailyData;")
+        conn.execute("ALTER TABLE dailyData_v2 RENAME TO dailyData;")
+        conn.execute(createDailyDataDateIndexCmd)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
+    return migrated
+
+# Stream (symbol, date, price, volume) rows for every stock in a snapshot without building a list
+# Histories that were never loaded (lazy mode) are unchanged in the database and are skipped.
+def _daily_data_rows(snapshot):
+    for stock, symbol, name, shares, columns in snapshot:
+        if columns is None:
+            continue
+        for row in zip(*columns):
+            yield (symbol, *row)
+
+# What save_stock_data writes for each stock, copied so it can be written on another thread while
+# the stocks keep changing: (stock, symbol, name, shares, (dates, closes, volumes) or None if the
+# history is not loaded). copy=False shares the columns instead, for writing straight away.
+def stock_snapshot(stock_list, copy=True):
+    snapshot = []
+    for stock in stock_list:
+        columns = None
+        if stock.history_loaded:
+            series = stock.DataList
+            columns = (series.dates, series.closes, series.volumes)
+            if copy:
+                columns = tuple(column[:] for column in columns)
+        snapshot.append((stock, stock.symbol.upper(), stock.name, stock.shares, columns))
+    return snapshot
+
+# Mark the stocks in a written snapshot saved, except any whose history changed after it was taken
+def mark_snapshot_saved(snapshot):
+    for stock, symbol, name, shares, columns in snapshot:
+        if columns is None or not stock.history_loaded:
+            continue
+        series = stock.DataList
+        if series.dates == columns[0] and series.closes == columns[1] and series.volumes == columns[2]:
+            stock.mark_history_saved()
+
+# Write a stock_snapshot() to the database in a single transaction; rows already there are updated.
+# The stocks themselves are not read or changed.
+def write_stock_snapshot(snapshot):
+    upsertStockCmd = """INSERT INTO stocks
                             (symbol, name, shares)
                             VALUES
-                            (?, ?, ?); """
-    insertDailyDataCmd = """INSERT INTO dailyData
+                            (?, ?, ?)
+                            ON CONFLICT (symbol) DO UPDATE SET
+                            name = excluded.name,
+                            shares = excluded.shares; """
+    upsertDailyDataCmd = """INSERT INTO dailyData
                                     (symbol, date, price, volume)
                                     VALUES
-                                    (?, ?, ?, ?);"""
+                                    (?, ?, ?, ?)
+                                    ON CONFLICT (symbol, date) DO UPDATE SET
+                                    price = excluded.price,
+                                    volume = excluded.volume;"""
+    try:
+        with stock_db.transaction() as conn:
+            conn.executemany(upsertStockCmd, ((symbol, name, shares) for stock, symbol, name, shares, columns in snapshot))
+            conn.executemany(upsertDailyDataCmd, _daily_data_rows(snapshot))
+    except sqlite3.Error as err:
+        raise RuntimeWarning(f"Unable to save stock data: {err}") from err
+
+# Save stocks and daily data into database
+# Everything is written in a single transaction; rows already in the database are updated.
+def save_stock_data(stock_list):
+    write_stock_snapshot(stock_snapshot(stock_list, copy=False))
     for stock in stock_list:
-        insertValues = (stock.symbol, stock.name, stock.shares)
-        try:
-            cur.execute(insertStockCmd, insertValues)
-            cur.execute("COMMIT;")
-        except:
-            pass
-        for daily_data in stock.DataList: 
-            insertValues = (stock.symbol,daily_data.date.strftime("%m/%d/%y"),daily_data.close,daily_data.volume)
-            try:
-                cur.execute(insertDailyDataCmd, insertValues)
-                cur.execute("COMMIT;")
-            except:
-                pass
+        stock.mark_history_saved()
     
+# Day ordinal for a version 1 dailyData.date value stored as mm/dd/yy.
+# Slices the fixed-width text directly (same century rule as strptime's %y) instead of running strptime per row.
+@cache
+def _text_to_ordinal(date_text):
+    if len(date_text) != 8:
+        return datetime.strptime(date_text, "%m/%d/%y").toordinal()
+    year = int(date_text[6:8])
+    year += 2000 if year < 69 else 1900
+    return date(year, int(date_text[0:2]), int(date_text[3:5])).toordinal()
+
+# Loads daily histories on demand for lazily loaded stocks and keeps at most
+# max_resident of them in memory, unloading the least recently used first.
+# Histories with unsaved data are never unloaded, so the bound can be exceeded
+# until the portfolio is saved.
+class HistoryCache:
+    def __init__(self, max_resident=DEFAULT_MAX_RESIDENT):
+        self.max_resident = max_resident
+        self._resident = OrderedDict() # symbol -> Stock, least recently used first
+        self.loads = 0
+
+    # Read one symbol's history (called by Stock.DataList when it is not in memory)
+    def load(self, stock):
+        series = PriceSeries()
+        dailyDataCmd = """SELECT date, price, volume
+                        FROM dailyData
+                        WHERE symbol = ?
+                        ORDER BY date; """
+        rows = stock_db.get_connection().execute(dailyDataCmd, (stock.symbol,)).fetchall()
+        if rows:
+            # the rows come in date order, so the columns are appended in one go
+            ordinals, prices, volumes = zip(*rows)
+            series.extend(ordinals, prices, volumes)
+        self.loads += 1
+        self._resident[stock.symbol] = stock
+        self._evict()
+        return series
+
+    def touch(self, stock):
+        if stock.symbol in self._resident:
+            self._resident.move_to_end(stock.symbol)
+            self._evict()
+
+    def _evict(self):
+        excess = len(self._resident) - self.max_resident
+        if excess <= 0:
+            return
+        for symbol, stock in list(self._resident.items())[:-1]:
+            if stock.history_modified:
+                continue
+            stock.unload_history()
+            del self._resident[symbol]
+            excess -= 1
+            if excess == 0:
+                break
+
 # Load stocks and daily data from database
-def load_stock_data(stock_list):
+# Two queries in total: the stock rows, then every daily row streamed in (symbol, date) order,
+# so each history is filled already sorted.
+# With lazy=True only the stocks table is read; each stock's history is fetched on first
+# access to its DataList and at most max_resident histories are kept in memory.
+def load_stock_data(stock_list, lazy=False, max_resident=DEFAULT_MAX_RESIDENT):
     stock_list.clear()
-    stockDB = "stocks.db"
-    conn = sqlite3.connect(stockDB)
-    stockCur = conn.cursor()
     stockSelectCmd = """SELECT symbol, name, shares
-                    FROM stocks; """
-    stockCur.execute(stockSelectCmd)
-    stockRows = stockCur.fetchall()
-    for row in stockRows:
-        new_stock = Stock(row[0],row[1],row[2])
-        dailyDataCur = conn.cursor()
-        dailyDataCmd = """SELECT date, price, volume
-                        FROM dailyData
-                        WHERE symbol=?; """
-        selectValue = (new_stock.symbol)
-        dailyDataCur.execute(dailyDataCmd,(selectValue,))
-        dailyDataRows = dailyDataCur.fetchall()
-        for dailyRow in dailyDataRows:
-            daily_data = DailyData(datetime.strptime(dailyRow[0],"%m/%d/%y"),float(dailyRow[1]),float(dailyRow[2]))
-            new_stock.add_data(daily_data)
-        stock_list.append(new_stock)
-    sortDailyData(stock_list)
+                    FROM stocks
+                    ORDER BY symbol; """
+    dailyDataCmd = """SELECT symbol, date, price, volume
+                    FROM dailyData
+                    ORDER BY symbol, date; """
+    with stock_db.transaction(write=False) as conn:
+        history_source = HistoryCache(max_resident) if lazy else None
+        stocks_by_symbol = {}
+        seen = set()
+        for row in conn.execute(stockSelectCmd):
+            # a symbol differing only in case (written by another program since create_database) is skipped
+            if row[0].upper() in seen:
+                continue
+            seen.add(row[0].upper())
+            new_stock = Stock(row[0],row[1],row[2],history_source)
+            stocks_by_symbol[new_stock.symbol] = new_stock
+            stock_list.append(new_stock)
+        if lazy:
+            return
+        current_symbol = None
+        add_bar = None
+        for symbol, ordinal, price, volume in conn.execute(dailyDataCmd):
+            if symbol != current_symbol:
+                current_symbol = symbol
+                stock = stocks_by_symbol.get(symbol)
+                add_bar = stock.DataList.add if stock else None
+            if add_bar:
+                add_bar(ordinal, float(price), float(volume))
 
-# Get stock price history from web using Web Scraping
-def retrieve_stock_web(dateStart,dateEnd,stock_list):
-    dateFrom = str(int(time.mktime(time.strptime(dateStart,"%m/%d/%y"))))
-    dateTo = str(int(time.mktime(time.strptime(dateEnd,"%m/%d/%y"))))
-    recordCount = 0
-    for stock in stock_list:
-        stockSymbol = stock.symbol
-        url = "https://finance.yahoo.com/quote/"+stockSymbol+"/history?period1="+dateFrom+"&period2="+dateTo+"&interval=1d&filter=history&frequency=1d"
+# Yahoo! Finance daily history page for one symbol (dateFrom/dateTo are Unix timestamps as text)
+def _history_url(symbol, dateFrom, dateTo, base_url=YAHOO_URL):
+    return base_url+"/quote/"+symbol+"/history?period1="+dateFrom+"&period2="+dateTo+"&interval=1d&filter=history&frequency=1d"
+
+# Row, cell and tag patterns for scanning the history table without building a document tree
+_rowPattern = re.compile(r"<tr\b[^>]*>(.*?)</tr>", re.S | re.I)
+_cellPattern = re.compile(r"<td\b[^>]*>(.*?)</td>", re.S | re.I)
+_tagPattern = re.compile(r"<[^>]+>")
+
+# Text of each cell in each table row of an HTML fragment
+def _table_rows(fragment):
+    rows = []
+    for row in _rowPattern.findall(fragment):
+        cells = []
+        for cell in _cellPattern.findall(row):
+            if "<" in cell:
+                cell = _tagPattern.sub("", cell)
+            if "&" in cell:
+                cell = html.unescape(cell)
+            cells.append(cell.strip())
+        if cells:
+            rows.append(cells)
+    return rows
+
+# Date in a history row ("Jan 02, 2024"); the same dates repeat on every symbol's page
+@cache
+def _history_date(text):
+    return datetime.strptime(text, "%b %d, %Y")
+
+# Split a Yahoo! Finance history page into price rows, dividends and stock splits.
+# Only the markup from the first <table> to the last </table> is parsed.
+# Returns (prices, dividends, splits): prices is a list of DailyData (adjusted close and volume),
+# dividends and splits are lists of (date, text) such as (date, "0.24 Dividend") or (date, "4:1 Stock Split").
+# Rows with missing values ("-") are skipped.
+def _parse_history_table(page_source):
+    start = page_source.find("<table")
+    end = page_source.rfind("</table>")
+    if start < 0 or end < 0:
+        return [], [], []
+    price_cells = []
+    dividends = []
+    splits = []
+    for cells in _table_rows(page_source[start:end + len("</table>")]):
+        if len(cells) == 7: # standard data row
+            if cells[5] not in ("-", "") and cells[6] not in ("-", ""):
+                price_cells.append(cells)
+        elif len(cells) == 2: # special case row: dividend or split
+            if "Dividend" in cells[1]:
+                dividends.append((_history_date(cells[0]), cells[1]))
+            elif "Split" in cells[1]:
+                splits.append((_history_date(cells[0]), cells[1]))
+    dates = [_history_date(cells[0]) for cells in price_cells]
+    closes = [float(cells[5].replace(',','')) for cells in price_cells]
+    volumes = [float(cells[6].replace(',','')) for cells in price_cells]
+    prices = [DailyData(*row) for row in zip(dates, closes, volumes)]
+    return prices, dividends, splits
+
+# Daily rows from a Yahoo! Finance history page (dividend and split rows are ignored)
+def _parse_history_rows(page_source):
+    return _parse_history_table(page_source)[0]
+
+# Headless Chrome sessions shared by every symbol in one retrieval.
+# Up to max_browsers sessions are started on demand and all of them are quit when the pool is closed.
+class BrowserPool:
+    def __init__(self, max_browsers=MAX_BROWSERS):
+        self.max_browsers = max_browsers
+        self._idle = queue.Queue()
+        self._drivers = []
+        self._starting = 0 # sessions being started outside the lock
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _start_driver(self):
         # Note this code assumes the use of the Chrome browser.
         # You will have to modify if you are using a different browser.
         options = webdriver.ChromeOptions()
+        options.add_argument("--headless=new")
         options.add_experimental_option('excludeSwitches',['enable-logging'])
         options.add_experimental_option("prefs",{'profile.managed_default_content_settings.javascript': 2})
         try:
             driver = webdriver.Chrome(options=options)
-            driver.implicitly_wait(60)
+        except Exception as err:
+            raise RuntimeWarning("Chrome Driver Not Found") from err
+        driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+        return driver
+
+    # An idle session, or a new one while fewer than max_browsers exist, or else the next one freed.
+    # Only the slot is reserved under the lock; Chrome starts outside it, so sessions start in parallel.
+    def _acquire(self):
+        while True:
+            with self._lock:
+                start = self._idle.empty() and self._starting + len(self._drivers) < self.max_browsers
+                if start:
+                    self._starting += 1
+            if start:
+                break
+            driver = self._idle.get()
+            if driver is not None:
+                return driver
+            # None: a session failed to start, so its slot is free again
+        try:
+            driver = self._start_driver()
+        except BaseException:
+            with self._lock:
+                self._starting -= 1
+            # wake one waiting thread to take the freed slot
+            self._idle.put(None)
+            raise
+        with self._lock:
+            self._starting -= 1
+            self._drivers.append(driver)
+        return driver
+
+    # Load url in an idle session and return the page HTML
+    def fetch(self, url):
+        driver = self._acquire()
+        try:
             driver.get(url)
-        except:
-            raise RuntimeWarning("Chrome Driver Not Found")
-
-        soup = BeautifulSoup(driver.page_source,"html.parser")
-        row = soup.find('table',class_="W(100%) M(0)")
-        dataRows = soup.find_all('tr')
-        for row in dataRows:
-            td = row.find_all('td')
-            rowList = [i.text for i in td]
-            columnCount = len(rowList)
-            if columnCount == 7: # This row is a standard data row (otherwise it's a special case such as dividend which will be ignored)
-                daily_data = DailyData(datetime.strptime(rowList[0],"%b %d, %Y"),float(rowList[5].replace(',','')),float(rowList[6].replace(',','')))
+            return driver.page_source
+        finally:
+            self._idle.put(driver)
+
+    def close(self):
+        with self._lock:
+            for driver in self._drivers:
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+            self._drivers.clear()
+
+# Fetch and parse one symbol's history; returns the rows and the fetch time in seconds
+def _fetch_history(pool, url):
+    begin = time.perf_counter()
+    page_source = pool.fetch(url)
+    seconds = time.perf_counter() - begin
+    return _parse_history_rows(page_source), seconds
+
+# Selenium backend: fetch max_browsers pages at a time over one shared BrowserPool.
+# jobs are (job, url) pairs; store(job, rows, seconds) is called on this thread as each page finishes.
+def _fetch_histories_browser(jobs, max_browsers, store, cancel=None):
+    with BrowserPool(max_browsers) as pool, ThreadPoolExecutor(max_workers=max_browsers) as executor:
+        futures = {executor.submit(_fetch_history, pool, url): job for job, url in jobs}
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            rows, seconds = future.result()
+            store(futures[future], rows, seconds)
+            if cancel and cancel.is_set():
+                for waiting in futures:
+                    waiting.cancel()
+
+# Plain HTTP GET of one page, returning the decoded HTML.
+# An error status, a refused connection or a timeout raises RuntimeWarning.
+def _http_get(url):
+    request = urllib.request.Request(url, headers={"User-Agent": HTTP_USER_AGENT, "Accept-Encoding": "gzip"})
+    try:
+        with urllib.request.urlopen(request, timeout=PAGE_LOAD_TIMEOUT) as response:
+            body = response.read()
+            if response.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            return body.decode(response.headers.get_content_charset() or "utf-8", errors="replace")
+    except OSError as err:
+        raise RuntimeWarning(f"Unable to retrieve {url}: {err}") from err
+
+# Download and parse one page over HTTP; returns the rows and the download time in seconds
+def _http_fetch_history(url):
+    begin = time.perf_counter()
+    page_source = _http_get(url)
+    seconds = time.perf_counter() - begin
+    return _parse_history_rows(page_source), seconds
+
+# HTTP backend: download pages without a browser, at most max_connections at a time.
+# Requests and parsing run in worker threads; store(job, rows, seconds) runs on the event loop thread.
+async def _fetch_histories_http(jobs, max_connections, store, cancel=None):
+    semaphore = asyncio.Semaphore(max_connections)
+    loop = asyncio.get_running_loop()
+
+    async def fetch(job, url):
+        async with semaphore:
+            if cancel and cancel.is_set():
+                return
+            rows, seconds = await loop.run_in_executor(executor, _http_fetch_history, url)
+        store(job, rows, seconds)
+
+    with ThreadPoolExecutor(max_workers=max_connections) as executor:
+        await asyncio.gather(*(fetch(job, url) for job, url in jobs))
+
+# First and last stored date ordinal for each stock, or (None, None) if it has no data.
+# Combines the database (two primary key seeks per symbol) with any history already in memory.
+def stored_date_spans(stock_list):
+    spanCmd = """SELECT (SELECT MIN(date) FROM dailyData WHERE symbol = ?),
+                        (SELECT MAX(date) FROM dailyData WHERE symbol = ?); """
+    spans = {}
+    with stock_db.transaction(write=False) as conn:
+        for stock in stock_list:
+            first, last = conn.execute(spanCmd, (stock.symbol, stock.symbol)).fetchone()
+            if stock.history_loaded and stock.DataList:
+                dates = stock.DataList.dates
+                first = min(dates) if first is None else min(first, min(dates))
+                last = max(dates) if last is None else max(last, max(dates))
+            spans[stock.symbol] = (first, last)
+    return spans
+
+# Parts of [start, end] (day ordinals) outside the stored span [first, last] that contain a weekday.
+# Gaps inside the stored span are not refetched.
+def _missing_ranges(start, end, first, last):
+    if first is None:
+        ranges = [(start, end)]
+    else:
+        ranges = []
+        if start < first:
+            ranges.append((start, min(end, first - 1)))
+        if end > last:
+            ranges.append((max(start, last + 1), end))
+    return [(low, high) for low, high in ranges
+            if any(datetime.fromordinal(day).weekday() < 5 for day in range(low, min(high, low + 6) + 1))]
+
+def _ordinal_to_timestamp(ordinal):
+    return str(int(time.mktime(datetime.fromordinal(ordinal).timetuple())))
+
+# Get stock price history from web using Web Scraping
+# backend is "selenium" (headless Chrome, max_browsers sessions) or "http" (plain requests under
+# asyncio, max_connections at once); base_url lets the http backend point at a local stand-in server.
+# With incremental=True each symbol only requests the dates it does not already have (symbols that
+# are already current are skipped) and rows are merged without duplicating (symbol, date).
+# Pages already retrieved are served from cache (a PageCache; None uses the shared web_page_cache(),
+# False disables caching).
+# progress, if given, is called as progress(symbol, record_count, seconds, cached) as each page finishes;
+# cached is True (and seconds 0.0) for pages served from the cache.
+# cancel, if given, is a threading.Event; once it is set no further pages are requested (pages
+# already loading still finish and are stored) and the records stored so far are counted.
+# To run this off the thread that owns the stocks, pass spans (stored_date_spans(stock_list), taken on
+# that thread) and apply: apply(stock, rows) is then given each stock's new rows instead of them
+# being added here, so nothing but stock.symbol is read and the stocks are not changed.
+def retrieve_stock_web(dateStart,dateEnd,stock_list,max_browsers=MAX_BROWSERS,progress=None,
+                       backend=None,max_connections=MAX_CONNECTIONS,base_url=YAHOO_URL,incremental=False,cache=None,
+                       cancel=None,spans=None,apply=None):
+    backend = backend or WEB_BACKEND
+    if cache is None:
+        cache = web_page_cache()
+    jobs = []
+    if incremental:
+        start = datetime.strptime(dateStart,"%m/%d/%y").toordinal()
+        end = datetime.strptime(dateEnd,"%m/%d/%y").toordinal()
+        if spans is None:
+            spans = stored_date_spans(stock_list)
+        for stock in stock_list:
+            for low, high in _missing_ranges(start, end, *spans[stock.symbol]):
+                # period2 is exclusive, so the request runs to the start of the day after high
+                dateFrom = _ordinal_to_timestamp(low)
+                dateTo = _ordinal_to_timestamp(high + 1)
+                jobs.append(((stock, low, high, dateFrom, dateTo), _history_url(stock.symbol, dateFrom, dateTo, base_url)))
+    else:
+        dateFrom = str(int(time.mktime(time.strptime(dateStart,"%m/%d/%y"))))
+        dateTo = str(int(time.mktime(time.strptime(dateEnd,"%m/%d/%y"))))
+        jobs = [((stock, None, None, dateFrom, dateTo), _history_url(stock.symbol, dateFrom, dateTo, base_url))
+                for stock in stock_list]
+    recordCount = 0
+
+    def store(job, rows, seconds, cached=False):
+        nonlocal recordCount
+        stock, low, high, dateFrom, dateTo = job
+        if low is not None:
+            # keep one row per date, inside the requested range only
+            by_date = {}
+            for daily_data in rows:
+                ordinal = daily_data.date.toordinal()
+                if low <= ordinal <= high:
+                    by_date[ordinal] = daily_data
+            rows = list(by_date.values())
+        if apply:
+            apply(stock, rows)
+        else:
+            for daily_data in rows:
                 stock.add_data(daily_data)
-                recordCount += 1
+        recordCount += len(rows)
+        if progress:
+            progress(stock.symbol, len(rows), seconds, cached)
+
+    def store_fetched(job, rows, seconds):
+        if cache and rows:
+            stock, low, high, dateFrom, dateTo = job
+            cache.put(stock.symbol, dateFrom, dateTo, "1d", rows)
+        store(job, rows, seconds)
+
+    pending = []
+    for job, url in jobs:
+        stock, low, high, dateFrom, dateTo = job
+        rows = cache.get(stock.symbol, dateFrom, dateTo, "1d") if cache else None
+        if rows is None:
+            pending.append((job, url))
+        else:
+            store(job, rows, 0.0, cached=True)
+    if not pending:
+        return recordCount
+    if backend == "selenium":
+        _fetch_histories_browser(pending, max_browsers, store_fetched, cancel)
+    elif backend == "http":
+        asyncio.run(_fetch_histories_http(pending, max_connections, store_fetched, cancel))
+    else:
+        raise ValueError(f"Unknown web backend {backend}")
     return recordCount
 
+# Shared on-disk cache of retrieved rows (None when WEB_CACHE_ENABLED is False)
+def web_page_cache():
+    global _web_page_cache
+    if not WEB_CACHE_ENABLED:
+        return None
+    if _web_page_cache is None:
+        _web_page_cache = PageCache()
+    return _web_page_cache
+
+# Day ordinals for a column of fixed-format date strings; each distinct date is decoded only once
+def _decode_dates(column, decode):
+    codes, uniques = pd.factorize(column)
+    return pd.Series([decode(text) for text in uniques], dtype="int64").take(codes).to_numpy()
+
+# Stream a CSV file as DataFrames of at most chunk_rows rows, so memory use does not grow with the file.
+# progress, if given, is called as progress(rows_read, bytes_read, total_bytes) after each chunk.
+def _read_csv_chunks(filename, chunk_rows, progress=None, **read_options):
+    total_bytes = os.path.getsize(filename)
+    rows_read = 0
+    with open(filename, "rb") as fh:
+        for frame in pd.read_csv(fh, chunksize=chunk_rows, **read_options):
+            rows_read += len(frame)
+            yield frame
+            if progress:
+                progress(rows_read, fh.tell(), total_bytes)
+
+# Chunks of (date ordinals, closes, volumes) from a Yahoo! Finance CSV (Date as YYYY-MM-DD)
+def _yahoo_csv_chunks(filename, chunk_rows=CSV_CHUNK_ROWS, progress=None):
+    for frame in _read_csv_chunks(filename, chunk_rows, progress, usecols=["Date", "Close", "Volume"], na_values=["null"],
+                                  dtype={"Date": str, "Close": "float64", "Volume": "float64"}):
+        frame = frame.dropna()
+        yield _decode_dates(frame["Date"], _iso_to_ordinal).tolist(), frame["Close"].tolist(), frame["Volume"].tolist()
+
+# Chunks of (symbols, date ordinals, prices, volumes) from a dailyData export (symbol,date,price,volume; date as mm/dd/yy)
+def _export_csv_chunks(filename, chunk_rows=CSV_CHUNK_ROWS, progress=None):
+    for frame in _read_csv_chunks(filename, chunk_rows, progress, usecols=["symbol", "date", "price", "volume"],
+                                  dtype={"symbol": str, "date": str, "price": "float64", "volume": "float64"}):
+        frame = frame.dropna()
+        yield frame["symbol"].tolist(), _decode_dates(frame["date"], _text_to_ordinal).tolist(), frame["price"].tolist(), frame["volume"].tolist()
+
 # Get price and volume history from Yahoo! Finance using CSV import.
-def import_stock_web_csv(stock_list,symbol,filename):
-    for stock in stock_list:
-            if stock.symbol == symbol:
-                with open(filename, newline='') as stockdata:
-                    datareader = csv.reader(stockdata,delimiter=',')
-                    next(datareader)
-                    for row in datareader:
-                        daily_data = DailyData(datetime.strptime(row[0],"%Y-%m-%d"),float(row[4]),float(row[6]))
-                        stock.add_data(daily_data)
+# The file is read in chunks and appended to the stock's columns without building a DailyData per row.
+def import_stock_web_csv(stock_list,symbol,filename,progress=None):
+    stock = find_stock(stock_list, symbol)
+    if stock:
+        for ordinals, closes, volumes in _yahoo_csv_chunks(filename, progress=progress):
+            stock.add_bars(ordinals, closes, volumes)
+
+# Import a CSV file straight into the database with constant memory use: chunks of chunk_rows rows are
+# converted and written (UPSERT) in one transaction each. The file is either a Yahoo! Finance CSV for
+# symbol, or a dailyData export with its own symbol column (symbol must then be None: an export can
+# hold any number of symbols, and importing it for one would write all of them).
+# Symbols are stored upper case; those not yet in the stocks table are added with 0 shares.
+# progress, if given, is called as progress(rows_read, bytes_read, total_bytes) after each chunk.
+# Returns the number of rows imported.
+# cancel, if given, is a threading.Event checked between chunks; chunks already written stay imported.
+def stream_csv_to_database(filename, symbol=None, chunk_rows=CSV_CHUNK_ROWS, progress=None, cancel=None):
+    with open(filename, newline='') as fh:
+        header = next(csv.reader(fh), [])
+    if "symbol" in header and symbol:
+        raise ValueError(f"{filename} is a dailyData export with its own symbol column, not a CSV for {symbol}")
+    if "symbol" in header:
+        chunks = _export_csv_chunks(filename, chunk_rows, progress)
+    elif symbol:
+        chunks = ((repeat(symbol.upper(), len(ordinals)), ordinals, closes, volumes)
+                  for ordinals, closes, volumes in _yahoo_csv_chunks(filename, chunk_rows, progress))
+    else:
+        raise ValueError(f"{filename} has no symbol column; a symbol is required")
+    insertStockCmd = """INSERT INTO stocks
+                            (symbol, name, shares)
+                            VALUES
+                            (?, ?, 0)
+                            ON CONFLICT (symbol) DO NOTHING; """
+    upsertDailyDataCmd = """INSERT INTO dailyData
+                                    (symbol, date, price, volume)
+                                    VALUES
+                                    (?, ?, ?, ?)
+                                    ON CONFLICT (symbol, date) DO UPDATE SET
+                                    price = excluded.price,
+                                    volume = excluded.volume;"""
+    recordCount = 0
+    known_symbols = set()
+    try:
+        for symbols, ordinals, prices, volumes in chunks:
+            if cancel and cancel.is_set():
+                break
+            symbols = [symbol.upper() for symbol in symbols]
+            new_symbols = set(symbols) - known_symbols
+            with stock_db.transaction() as conn:
+                conn.executemany(insertStockCmd, ((new_symbol, new_symbol) for new_symbol in new_symbols))
+                conn.executemany(upsertDailyDataCmd, zip(symbols, ordinals, prices, volumes))
+            known_symbols |= new_symbols
+            recordCount += len(ordinals)
+    except sqlite3.Error as err:
+        raise RuntimeWarning(f"Unable to import {filename}: {err}") from err
+    return recordCount
+
+# A symbol's stored history as columns (date ordinals, closes, volumes) in date order.
+# Only reads the database, so it can run on any thread.
+def read_history_columns(symbol):
+    dailyDataCmd = """SELECT date, price, volume
+                    FROM dailyData
+                    WHERE symbol = ?
+                    ORDER BY date; """
+    rows = stock_db.get_connection().execute(dailyDataCmd, (symbol,)).fetchall()
+    return tuple(zip(*rows)) if rows else ((), (), ())
+
+# Replace a stock's in-memory history with what is stored in the database, or with columns
+# already read by read_history_columns() (e.g. on another thread)
+# (a lazily loaded history that is not in memory is read fresh on next access anyway)
+def reload_history(stock, columns=None):
+    if not stock.history_loaded:
+        return
+    ordinals, closes, volumes = columns or read_history_columns(stock.symbol)
+    series = stock.DataList
+    series.clear()
+    series.extend(ordinals, closes, volumes)
+    stock.mark_history_saved()
+
+# Symbol for a Yahoo! Finance CSV named <SYMBOL>_yahoo.csv, or None for other files
+def _csv_symbol(filename):
+    match = re.fullmatch(r"(.+)_yahoo\.csv", filename, re.I)
+    return match.group(1).upper() if match else None
+
+# Day ordinal for a YYYY-MM-DD date, decoded by position (dates repeat across every file)
+@cache
+def _iso_to_ordinal(date_text):
+    return date(int(date_text[0:4]), int(date_text[5:7]), int(date_text[8:10])).toordinal()
+
+# Read one Yahoo! Finance CSV into columns (runs in a worker process).
+# Large files are parsed by pandas with each distinct date decoded once by position; small
+# files (a few years of daily bars) are faster to split line by line than to pay pandas' per-call cost.
+# Rows with missing values are dropped. Returns (symbol, date ordinals, closes, volumes) as lists.
+def _read_yahoo_csv(symbol, filename):
+    if os.path.getsize(filename) >= VECTORIZED_CSV_BYTES:
+        frame = pd.read_csv(filename, usecols=["Date", "Close", "Volume"], na_values=["null"],
+                            dtype={"Date": str, "Close": "float64", "Volume": "float64"}).dropna()
+        return symbol, _decode_dates(frame["Date"], _iso_to_ordinal).tolist(), frame["Close"].tolist(), frame["Volume"].tolist()
+    ordinals = []
+    closes = []
+    volumes = []
+    with open(filename, newline='') as stockdata:
+        header = next(stockdata).strip().split(",")
+        closeColumn = header.index("Close")
+        volumeColumn = header.index("Volume")
+        for line in stockdata:
+            row = line.split(",")
+            try:
+                close = float(row[closeColumn])
+                volume = float(row[volumeColumn])
+            except (ValueError, IndexError):
+                continue # missing ("null") or truncated row
+            ordinals.append(_iso_to_ordinal(row[0]))
+            closes.append(close)
+            volumes.append(volume)
+    return symbol, ordinals, closes, volumes
+
+# Import every <SYMBOL>_yahoo.csv file in a directory straight into the database.
+# Files are parsed in parallel by a pool of worker processes; rows are written in batches of
+# batch_size with UPSERT, one transaction per batch. Symbols not yet in the stocks table are added
+# with 0 shares. progress, if given, is called as progress(symbol, record_count) for each file.
+# cancel, if given, is a threading.Event checked after each file; files read before it was set are imported.
+# Returns (file_count, record_count). In-memory stocks are not updated; reload them afterwards.
+def import_stock_csv_directory(directory, workers=None, batch_size=50000, progress=None, cancel=None):
+    files = []
+    for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+        symbol = _csv_symbol(entry.name)
+        if symbol and entry.is_file():
+            files.append((symbol, entry.path))
+    if not files:
+        return 0, 0
+    insertStockCmd = """INSERT INTO stocks
+                            (symbol, name, shares)
+                            VALUES
+                            (?, ?, 0)
+                            ON CONFLICT (symbol) DO NOTHING; """
+    upsertDailyDataCmd = """INSERT INTO dailyData
+                                    (symbol, date, price, volume)
+                                    VALUES
+                                    (?, ?, ?, ?)
+                                    ON CONFLICT (symbol, date) DO UPDATE SET
+                                    price = excluded.price,
+                                    volume = excluded.volume;"""
+    recordCount = 0
+    batch = []
+
+    def write_batch():
+        with stock_db.transaction() as conn:
+            conn.executemany(upsertDailyDataCmd, batch)
+        batch.clear()
+
+    try:
+        with stock_db.transaction() as conn:
+            conn.executemany(insertStockCmd, ((symbol, symbol) for symbol, _ in files))
+        # a single worker gains nothing from a separate process, so parse in this one
+        parallel = (workers or os.cpu_count() or 1) > 1
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=PROCESS_CONTEXT) if parallel else nullcontext()
+        with pool as executor:
+            symbols, paths = zip(*files)
+            mapper = partial(executor.map, chunksize=16) if parallel else map
+            for symbol, ordinals, closes, volumes in mapper(_read_yahoo_csv, symbols, paths):
+                if cancel and cancel.is_set():
+                    if parallel:
+                        executor.shutdown(wait=False, cancel_futures=True)
+                    break
+                batch.extend(zip(repeat(symbol), ordinals, closes, volumes))
+                recordCount += len(ordinals)
+                if len(batch) >= batch_size:
+                    write_batch()
+                if progress:
+                    progress(symbol, len(ordinals))
+        if batch:
+            write_batch()
+    except sqlite3.Error as err:
+        raise RuntimeWarning(f"Unable to import CSV files: {err}") from err
+    return len(files), recordCount
 
 def main():
     clear_screen()
     print("This module will handle data storage and retrieval.")
+    # python stock_data.py migrate [path/to/stocks.db]
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate":
+        if len(sys.argv) > 2:
+            stock_db.configure(path=sys.argv[2])
+        migrated = migrate_database(progress=lambda count: print(f"  {count:,} rows migrated", end="\r"))
+        print(f"{stock_db.database_path()} is at schema version {SCHEMA_VERSION} ({migrated:,} rows migrated).")
 
 if __name__ == "__main__":
     # execute only if run as a stand-alone script
@@ -0,0 +1,140 @@
+# Summary: This module manages the SQLite connections used by stock_data.
+# Each thread (and each process) gets one persistent connection to the configured database, kept until
+# the thread ends or calls release_connection(). Connections are opened in WAL mode with a busy timeout,
+# so readers never block the writer and a second writer waits for the lock instead of failing with
+# "database is locked".
+
+import atexit
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+# Connection settings, changed through configure()
+settings = {
+    "path": "stocks.db",
+    "busy_timeout_ms": 5000,   # how long SQLite itself waits for a lock
+    "busy_retries": 5,         # extra attempts to start a write transaction after the timeout expires
+    "retry_delay": 0.05,       # first back-off delay in seconds, doubled on each retry
+    "synchronous": "NORMAL",   # safe with WAL; only the last commits can be lost on power failure
+    "cache_size_kib": 20000,
+}
+
+_local = threading.local()
+_connections = weakref.WeakSet() # the open connections of live threads
+_connections_lock = threading.Lock()
+_generation = 0 # bumped by close_all() so every thread reopens its connection
+
+
+# Change connection settings (e.g. the database path); open connections are closed
+# and reopened with the new settings on next use.
+def configure(**options):
+    unknown = set(options) - set(settings)
+    if unknown:
+        raise ValueError(f"Unknown database settings: {', '.join(sorted(unknown))}")
+    close_all()
+    settings.update(options)
+
+
+def database_path():
+    return settings["path"]
+
+
+def _connect():
+    conn = sqlite3.connect(settings["path"], timeout=settings["busy_timeout_ms"] / 1000,
+                           isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute(f"PRAGMA busy_timeout = {int(settings['busy_timeout_ms'])};")
+    conn.execute(f"PRAGMA synchronous = {settings['synchronous']};")
+    conn.execute(f"PRAGMA cache_size = -{int(settings['cache_size_kib'])};")
+    return conn
+
+
+# One thread's connection. The thread-local storage holds the only strong reference, so the
+# connection is closed when its thread ends, by release_connection() or by close_all().
+class _ThreadConnection:
+    def __init__(self, conn):
+        self.conn = conn
+        self.pid = os.getpid()
+        self.generation = _generation
+        self.close = weakref.finalize(self, _close, conn, self.pid)
+
+
+# A connection inherited across fork() belongs to the parent process and is left alone
+def _close(conn, pid):
+    if pid != os.getpid():
+        return
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+
+# The calling thread's connection, opened on first use.
+# Connections are in autocommit mode; use transaction() to group statements.
+def get_connection():
+    state = getattr(_local, "state", None)
+    # A connection inherited across fork() must not be used by the child process
+    if state is None or state.pid != os.getpid() or state.generation != _generation:
+        state = _ThreadConnection(_connect())
+        _local.state = state
+        with _connections_lock:
+            _connections.add(state)
+    return state.conn
+
+
+# Close the calling thread's connection now; worker threads call this when they finish.
+# The next get_connection() on the thread opens a new one.
+def release_connection():
+    state = getattr(_local, "state", None)
+    if state is not None:
+        del _local.state
+        with _connections_lock:
+            _connections.discard(state)
+        state.close()
+
+
+def close_all():
+    global _generation
+    with _connections_lock:
+        for state in list(_connections):
+            state.close()
+        _connections.clear()
+        _generation += 1
+
+
+def _is_busy(err):
+    message = str(err)
+    return "locked" in message or "busy" in message
+
+
+# Run the body in a transaction on this thread's connection, committing on success and
+# rolling back on any exception. Write transactions take the write lock up front
+# (BEGIN IMMEDIATE), retrying with back-off if another writer still holds it after the
+# busy timeout. Read transactions (write=False) see one consistent snapshot.
+@contextmanager
+def transaction(write=True):
+    conn = get_connection()
+    begin = "BEGIN IMMEDIATE;" if write else "BEGIN;"
+    delay = settings["retry_delay"]
+    for attempt in range(settings["busy_retries"] + 1):
+        try:
+            conn.execute(begin)
+            break
+        except sqlite3.OperationalError as err:
+            if not _is_busy(err) or attempt == settings["busy_retries"]:
+                raise
+            time.sleep(delay)
+            delay *= 2
+    try:
+        yield conn
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK;")
+        raise
+    conn.execute("COMMIT;")
+
+
+atexit.register(close_all)
@@ -0,0 +1,235 @@
+# Summary: This module generates the stock report without any user interaction, for scheduled runs.
+# Each stock's figures come from report_row(), the same calculation the console report prints.
+# Rows for stocks in the database are computed across a pool of worker processes, each reading its
+# share of the symbols itself, then written as CSV, JSON or Markdown to a file or stdout.
+# Rows are written as they arrive when they are in symbol order; sorting by another field or taking
+# the top N needs every row first. Timing for each row and for the whole run is included.
+#   python stock_report.py --format markdown --sort profit_loss --descending --top 20
+#   python stock_report.py --format csv --output report.csv --page 2 --page-size 100
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+from functools import partial
+from stock_class import Stock
+import stock_data
+import stock_db
+
+FIELDS = ("symbol", "name", "shares", "records", "first_date", "latest_date", "latest_close", "min_close",
+          "max_close", "avg_close", "total_volume", "profit_loss", "profit_loss_percent", "seconds")
+FORMATS = ("csv", "json", "markdown")
+CHUNK_SYMBOLS = 50 # symbols handed to a worker at a time
+
+
+# Report figures for one stock (None for the figures of a stock with no history)
+def report_row(stock):
+    summary = stock.summary()
+    row = {"symbol": stock.symbol, "name": stock.name, "shares": stock.shares, "records": 0}
+    if not summary:
+        row.update(dict.fromkeys(FIELDS[4:13]))
+        return row
+    row.update({"records": summary["count"],
+                "first_date": summary["first_date"].strftime("%Y-%m-%d"),
+                "latest_date": summary["last_date"].strftime("%Y-%m-%d"),
+                "latest_close": summary["last_close"],
+                "min_close": summary["min_close"],
+                "max_close": summary["max_close"],
+                "avg_close": summary["avg_close"],
+                "total_volume": summary["total_volume"],
+                "profit_loss": summary["profit_loss"],
+                "profit_loss_percent": summary["profit_loss_percent"]})
+    return row
+
+
+# Report rows for one chunk of symbols, read from the database (runs in a worker process).
+# Each history is loaded, summarized and dropped before the next, so memory stays flat.
+def _report_rows(symbols, db_path=None):
+    if db_path and db_path != stock_db.database_path():
+        stock_db.configure(path=db_path)
+    stockSelectCmd = f"""SELECT symbol, name, shares
+                    FROM stocks
+                    WHERE symbol IN ({", ".join("?" * len(symbols))})
+                    ORDER BY symbol; """
+    history_source = stock_data.HistoryCache(max_resident=1)
+    rows = []
+    for symbol, name, shares in stock_db.get_connection().execute(stockSelectCmd, symbols):
+        begin = time.perf_counter()
+        stock = Stock(symbol, name, shares, history_source)
+        row = report_row(stock)
+        stock.unload_history()
+        row["seconds"] = time.perf_counter() - begin
+        rows.append(row)
+    return rows
+
+
+# Rows for stocks already in memory (unsaved changes included)
+def _stock_rows(stock_list):
+    for stock in stock_list:
+        begin = time.perf_counter()
+        row = report_row(stock)
+        row["seconds"] = time.perf_counter() - begin
+        yield row
+
+
+def _database_symbols():
+    with stock_db.transaction(write=False) as conn:
+        return [symbol for (symbol,) in conn.execute("SELECT symbol FROM stocks ORDER BY symbol;")]
+
+
+# Rows for symbols in the database, computed across worker processes in symbol order
+def _database_rows(symbols, workers):
+    chunks = [symbols[i:i + CHUNK_SYMBOLS] for i in range(0, len(symbols), CHUNK_SYMBOLS)]
+    # a single worker gains nothing from a separate process, so compute in this one
+    parallel = workers > 1
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=stock_data.PROCESS_CONTEXT) if parallel else nullcontext()
+    with pool as executor:
+        mapper = executor.map if parallel else map
+        for rows in mapper(partial(_report_rows, db_path=os.path.abspath(stock_db.database_path())), chunks):
+            yield from rows
+
+
+def _page(items, page, page_size):
+    if not page_size:
+        return items
+    start = (max(page, 1) - 1) * page_size
+    return items[start:start + page_size]
+
+
+# Writers stream rows in one format; finish() adds the run's timing
+class _CsvWriter:
+    def __init__(self, output):
+        self.writer = csv.DictWriter(output, fieldnames=FIELDS)
+        self.writer.writeheader()
+
+    def write(self, row):
+        self.writer.writerow(row)
+
+    def finish(self, timing):
+        pass # CSV holds rows only; the caller reports timing separately
+
+
+class _JsonWriter:
+    def __init__(self, output):
+        self.output = output
+        self.count = 0
+        output.write('{"rows": [')
+
+    def write(self, row):
+        self.output.write(("," if self.count else "") + "\n  " + json.dumps(row))
+        self.count += 1
+
+    def finish(self, timing):
+        self.output.write("\n], \"timing\": " + json.dumps(timing) + "}\n")
+
+
+class _MarkdownWriter:
+    def __init__(self, output):
+        self.output = output
+        output.write("| " + " | ".join(FIELDS) + " |\n")
+        output.write("|" + "---|" * len(FIELDS) + "\n")
+
+    def write(self, row):
+        cells = []
+        for field in FIELDS:
+            value = row[field]
+            if value is None:
+                cells.append("")
+            elif isinstance(value, float):
+                cells.append(f"{value:.6f}" if field == "seconds" else f"{value:,.2f}")
+            else:
+                cells.append(str(value).replace("|", "\\|"))
+        self.output.write("| " + " | ".join(cells) + " |\n")
+
+    def finish(self, timing):
+        self.output.write(f"\n{timing['rows']} rows from {timing['stocks']} stocks in {timing['seconds']:.3f}s "
+                          f"({timing['workers']} workers), generated {timing['generated']}\n")
+
+
+_WRITERS = {"csv": _CsvWriter, "json": _JsonWriter, "markdown": _MarkdownWriter}
+
+
+# Write the report for stock_list (in memory), or for every stock in the database if it is None.
+# symbols limits the report to those stocks. Rows are ordered by sort_by (a FIELDS name), cut to
+# the first top rows, then to page number page (from 1) of page_size rows.
+# Returns the timing figures: rows written, stocks computed, seconds, rows per second, workers.
+def generate_report(output=None, fmt="csv", stock_list=None, symbols=None, sort_by="symbol", descending=False,
+                    top=None, page=1, page_size=None, workers=None):
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unknown report format {fmt}. Choose from: {', '.join(FORMATS)}")
+    if sort_by not in FIELDS:
+        raise ValueError(f"Unknown sort field {sort_by}. Choose from: {', '.join(FIELDS)}")
+    output = output or sys.stdout
+    begin = time.perf_counter()
+    wanted = {symbol.upper() for symbol in symbols} if symbols else None
+    in_symbol_order = sort_by == "symbol" and not descending
+    if stock_list is not None:
+        stocks = sorted((stock for stock in stock_list if not wanted or stock.symbol.upper() in wanted),
+                        key=lambda stock: stock.symbol.upper())
+        if in_symbol_order:
+            stocks = _page(stocks[:top] if top else stocks, page, page_size)
+        stock_count = len(stocks)
+        rows = _stock_rows(stocks)
+        workers = 1
+    else:
+        all_symbols = [symbol for symbol in _database_symbols() if not wanted or symbol.upper() in wanted]
+        if in_symbol_order:
+            # only the rows that will be written are computed
+            all_symbols = _page(all_symbols[:top] if top else all_symbols, page, page_size)
+        stock_count = len(all_symbols)
+        chunk_count = -(-stock_count // CHUNK_SYMBOLS)
+        workers = max(1, min(workers or os.cpu_count() or 1, chunk_count))
+        rows = _database_rows(all_symbols, workers)
+    if not in_symbol_order:
+        # every row is needed before sorting; rows without the figure (no history) go last
+        rows = list(rows)
+        present = [row for row in rows if row[sort_by] is not None]
+        missing = [row for row in rows if row[sort_by] is None]
+        present.sort(key=lambda row: row[sort_by], reverse=descending)
+        rows = present + missing
+        rows = _page(rows[:top] if top else rows, page, page_size)
+    writer = _WRITERS[fmt](output)
+    count = 0
+    for row in rows:
+        writer.write(row)
+        count += 1
+    seconds = time.perf_counter() - begin
+    timing = {"rows": count, "stocks": stock_count, "seconds": seconds,
+              "rows_per_second": count / seconds if seconds else None, "workers": workers,
+              "generated": datetime.now().isoformat(timespec="seconds")}
+    writer.finish(timing)
+    return timing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the stock report without user interaction.")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--output", help="file to write (default: stdout)")
+    parser.add_argument("--db", help="database path (default: stocks.db)")
+    parser.add_argument("--symbols", help="comma-separated symbols to include (default: all)")
+    parser.add_argument("--sort", choices=FIELDS, default="symbol", help="field to order rows by")
+    parser.add_argument("--descending", action="store_true")
+    parser.add_argument("--top", type=int, help="keep only the first N rows after sorting")
+    parser.add_argument("--page", type=int, default=1, help="page number (from 1) when --page-size is given")
+    parser.add_argument("--page-size", type=int)
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+    if args.db:
+        stock_db.configure(path=args.db)
+    stock_data.create_database()
+    symbols = [symbol.strip() for symbol in args.symbols.split(",") if symbol.strip()] if args.symbols else None
+    with open(args.output, "w", newline="") if args.output else nullcontext(sys.stdout) as output:
+        timing = generate_report(output, args.format, symbols=symbols, sort_by=args.sort, descending=args.descending,
+                                 top=args.top, page=args.page, page_size=args.page_size, workers=args.workers)
+    print(f"{timing['rows']} rows from {timing['stocks']} stocks in {timing['seconds']:.3f}s "
+          f"({timing['workers']} workers)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    # execute only if run as a stand-alone script
+    main()
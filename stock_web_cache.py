@@ -0,0 +1,121 @@
+# Summary: This module contains the on-disk cache of daily rows retrieved from Yahoo! Finance.
+# Each entry holds the parsed price rows for one (symbol, period1, period2, interval) request,
+# gzip-compressed in its own file. The gzip header records when the entry was written (for the TTL)
+# and the file modification time records when it was last used (for LRU eviction).
+
+import gzip
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from stock_class import DailyData
+
+CACHE_DIR = "web_cache"
+DEFAULT_TTL = 6 * 60 * 60           # seconds an entry is served before it is fetched again
+DEFAULT_MAX_BYTES = 64 * 2**20      # total size of all entries before the least recently used are removed
+
+
+class PageCache:
+    def __init__(self, directory=CACHE_DIR, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # file name -> size, least recently used first
+        self._total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        existing = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.name.endswith(".csv.gz"):
+                stat = entry.stat()
+                existing.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, filename, size in sorted(existing):
+            self._entries[filename] = size
+            self._total_bytes += size
+
+    @staticmethod
+    def _filename(symbol, period1, period2, interval):
+        return f"{re.sub(r'[^A-Za-z0-9.-]', '_', symbol)}_{period1}_{period2}_{interval}.csv.gz"
+
+    # Cached rows (list of DailyData) for a request, or None if missing, older than the TTL or unreadable.
+    # A truncated or corrupt entry counts as a miss and its file is removed.
+    def get(self, symbol, period1, period2, interval="1d"):
+        filename = self._filename(symbol, period1, period2, interval)
+        path = os.path.join(self.directory, filename)
+        with self._lock:
+            try:
+                with open(path, "rb") as fh:
+                    data = fh.read()
+            except FileNotFoundError:
+                self.misses += 1
+                self._forget(filename)
+                return None
+            written = int.from_bytes(data[4:8], "little")
+            if time.time() - written > self.ttl:
+                self.misses += 1
+                self._remove(filename)
+                return None
+            # parsed under the lock, so a corrupt entry is never removed after put() has replaced it
+            try:
+                rows = []
+                for line in gzip.decompress(data).decode().splitlines():
+                    ordinal, close, volume = line.split(",")
+                    rows.append(DailyData(datetime.fromordinal(int(ordinal)), float(close), float(volume)))
+            except (OSError, EOFError, ValueError, gzip.BadGzipFile, zlib.error):
+                self.misses += 1
+                self._remove(filename)
+                return None
+            self.hits += 1
+            os.utime(path)
+            self._forget(filename)
+            self._entries[filename] = len(data)
+            self._total_bytes += len(data)
+        return rows
+
+    # Store the rows for a request, then evict least recently used entries over max_bytes
+    def put(self, symbol, period1, period2, interval, rows):
+        filename = self._filename(symbol, period1, period2, interval)
+        text = "\n".join(f"{daily_data.date.toordinal()},{daily_data.close!r},{daily_data.volume!r}" for daily_data in rows)
+        data = gzip.compress(text.encode(), mtime=int(time.time()))
+        path = os.path.join(self.directory, filename)
+        with self._lock:
+            with open(path + ".tmp", "wb") as fh:
+                fh.write(data)
+            os.replace(path + ".tmp", path)
+            self._forget(filename)
+            self._entries[filename] = len(data)
+            self._total_bytes += len(data)
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._entries), "bytes": self._total_bytes}
+
+    def clear(self):
+        with self._lock:
+            for filename in list(self._entries):
+                self._remove(filename)
+
+    # Drop an entry from the index (the caller holds the lock)
+    def _forget(self, filename):
+        size = self._entries.pop(filename, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    # Delete an entry's file and drop it from the index (the caller holds the lock)
+    def _remove(self, filename):
+        self._forget(filename)
+        try:
+            os.remove(os.path.join(self.directory, filename))
+        except FileNotFoundError:
+            pass
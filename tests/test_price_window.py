@@ -0,0 +1,24 @@
+# Summary: Tests for PriceWindow: its columns are copies, so bars can still be added to the
+# stock while they are held.
+
+from datetime import datetime, timedelta
+from stock_class import Stock, DailyData
+
+
+def _stock(days):
+    stock = Stock("TEST", "Test", 10)
+    for day in range(days):
+        stock.add_data(DailyData(datetime(2020, 1, 1) + timedelta(days=day), 100.0 + day, 1000.0))
+    return stock
+
+
+def test_columns_do_not_block_adding_bars():
+    stock = _stock(10)
+    bars = stock.window(datetime(2020, 1, 3), datetime(2020, 1, 5))
+    dates, closes, volumes = bars.dates, bars.closes, bars.volumes
+    stock.add_data(DailyData(datetime(2020, 2, 1), 50.0, 10.0))
+    stock.add_bars([datetime(2019, 12, 1).toordinal()], [60.0], [20.0])
+    assert len(stock.DataList) == 12
+    assert list(closes) == [102.0, 103.0, 104.0]
+    assert list(dates) == [datetime(2020, 1, day).toordinal() for day in (3, 4, 5)]
+    assert list(volumes) == [1000.0] * 3
@@ -0,0 +1,90 @@
+# Summary: Tests for stock_db: several processes saving into one WAL database at once must
+# all succeed, and every row they wrote must be there exactly once with the value written.
+
+import multiprocessing
+import sqlite3
+import threading
+from datetime import date
+import pytest
+from stock_class import Stock
+import stock_data
+import stock_db
+
+WRITERS = 6
+ROUNDS = 8
+SYMBOLS = 4          # symbols each writer owns, besides the SHARED symbol every writer saves
+BARS = 500
+FIRST_DAY = date(2000, 1, 3).toordinal()
+
+
+def _close(writer, day):
+    return 100.0 + writer + day / 1000
+
+
+# Save this writer's stocks ROUNDS times (runs in a worker process)
+def _writer(db_path, writer):
+    stock_db.configure(path=db_path, busy_timeout_ms=2000)
+    stock_list = [Stock(f"W{writer}S{number}", f"Writer {writer}", writer) for number in range(SYMBOLS)]
+    stock_list.append(Stock("SHARED", "Shared", 0))
+    for stock in stock_list:
+        stock.DataList.extend(range(FIRST_DAY, FIRST_DAY + BARS),
+                              [_close(writer, day) for day in range(BARS)],
+                              [float(writer * BARS + day) for day in range(BARS)])
+    for _ in range(ROUNDS):
+        stock_data.save_stock_data(stock_list)
+    stock_db.close_all()
+
+
+@pytest.fixture
+def database(tmp_path):
+    db_path = str(tmp_path / "stocks.db")
+    stock_db.configure(path=db_path)
+    stock_data.create_database()
+    yield db_path
+    stock_db.configure(path="stocks.db")
+
+
+def test_concurrent_writer_processes(database):
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(WRITERS) as pool:
+        # any error in a writer (such as "database is locked") is raised here
+        pool.starmap(_writer, [(database, writer) for writer in range(WRITERS)])
+
+    conn = stock_db.get_connection()
+    assert conn.execute("SELECT COUNT(*) FROM stocks;").fetchone()[0] == WRITERS * SYMBOLS + 1
+    assert conn.execute("SELECT COUNT(*) FROM dailyData;").fetchone()[0] == (WRITERS * SYMBOLS + 1) * BARS
+    for writer in range(WRITERS):
+        for number in range(SYMBOLS):
+            symbol = f"W{writer}S{number}"
+            assert conn.execute("SELECT name, shares FROM stocks WHERE symbol = ?;", (symbol,)).fetchone() \
+                == (f"Writer {writer}", writer)
+            rows = conn.execute("SELECT date, price, volume FROM dailyData WHERE symbol = ? ORDER BY date;",
+                                (symbol,)).fetchall()
+            assert rows == [(FIRST_DAY + day, _close(writer, day), float(writer * BARS + day)) for day in range(BARS)]
+    # every writer saves SHARED; each row holds one writer's whole row, never a mix
+    for ordinal, price, volume in conn.execute("SELECT date, price, volume FROM dailyData WHERE symbol = 'SHARED';"):
+        day = ordinal - FIRST_DAY
+        writer = int(volume) // BARS
+        assert 0 <= writer < WRITERS and volume == writer * BARS + day
+        assert price == _close(writer, day)
+
+
+def test_connections_closed_when_threads_end(database):
+    opened = []
+    threads = [threading.Thread(target=lambda: opened.append(stock_db.get_connection())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(opened) == 4
+    for conn in opened:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1;")
+
+
+def test_release_connection(database):
+    conn = stock_db.get_connection()
+    stock_db.release_connection()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1;")
+    assert stock_db.get_connection() is not conn
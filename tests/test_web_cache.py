@@ -0,0 +1,29 @@
+# Summary: Tests for PageCache: a truncated or corrupt entry is a miss and its file is removed.
+
+import gzip
+import os
+import time
+from datetime import datetime
+import pytest
+from stock_class import DailyData
+from stock_web_cache import PageCache
+
+ROWS = [DailyData(datetime(2020, 1, day), 100.0 + day, 1000.0) for day in range(1, 6)]
+
+
+@pytest.mark.parametrize("damage", [
+    lambda data: data[:len(data) // 2],                                    # truncated
+    lambda data: data[:10] + bytes(len(data) - 10),                        # deflate stream zeroed
+    lambda data: gzip.compress(b"not,a,number\nx", mtime=int(time.time())),  # bad rows
+])
+def test_corrupt_entry_is_a_miss(tmp_path, damage):
+    cache = PageCache(str(tmp_path))
+    cache.put("TEST", "1", "2", "1d", ROWS)
+    assert [(row.date, row.close, row.volume) for row in cache.get("TEST", "1", "2")] \
+        == [(row.date, row.close, row.volume) for row in ROWS]
+    (path,) = tmp_path.iterdir()
+    path.write_bytes(damage(path.read_bytes()))
+    assert cache.get("TEST", "1", "2") is None
+    assert not os.path.exists(path)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["bytes"]) == (1, 1, 0, 0)
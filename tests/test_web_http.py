@@ -0,0 +1,91 @@
+# Summary: Tests for the browserless HTTP backend of stock_data.retrieve_stock_web, run against a
+# local stand-in for Yahoo! Finance: the parsed rows, the limit on requests in flight, and an HTTP
+# error surfacing as RuntimeWarning.
+
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from benchmarks import synthetic_bars, synthetic_history_page
+from stock_class import Stock
+import stock_data
+
+BARS = 80
+START, END = "01/01/90", "12/31/90"
+
+
+# Stand-in server returning page for every history URL, after latency seconds, except for the
+# symbols in errors (symbol -> HTTP status). Yields the base URL and the server's request counters.
+@contextmanager
+def history_server(page, latency=0.0, errors=None):
+    body = page.encode()
+    counters = {"requests": 0, "in_flight": 0, "max_in_flight": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                counters["requests"] += 1
+                counters["in_flight"] += 1
+                counters["max_in_flight"] = max(counters["max_in_flight"], counters["in_flight"])
+            try:
+                time.sleep(latency)
+                symbol = self.path.split("/")[2]
+                if symbol in (errors or {}):
+                    self.send_error(errors[symbol])
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            finally:
+                with lock:
+                    counters["in_flight"] -= 1
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}", counters
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _retrieve(stock_list, base_url, max_connections=4):
+    return stock_data.retrieve_stock_web(START, END, stock_list, backend="http", base_url=base_url,
+                                         max_connections=max_connections, cache=False)
+
+
+def test_parsed_rows():
+    stock = Stock("TEST", "Test", 10)
+    with history_server(synthetic_history_page(BARS)) as (base_url, counters):
+        records = _retrieve([stock], base_url)
+    assert records == BARS
+    assert counters["requests"] == 1
+    # the page shows closes to the cent and has dividend rows, which are skipped
+    expected = [(day.toordinal(), round(close, 2), volume) for day, close, volume in synthetic_bars(BARS)]
+    series = stock.DataList
+    assert list(zip(series.dates, series.closes, series.volumes)) == expected
+
+
+@pytest.mark.parametrize("max_connections", [1, 3])
+def test_connection_limit(max_connections):
+    stock_list = [Stock(f"S{number}", "Synthetic", 1) for number in range(12)]
+    with history_server(synthetic_history_page(5), latency=0.05) as (base_url, counters):
+        records = _retrieve(stock_list, base_url, max_connections)
+    assert records == 12 * 5
+    assert counters["requests"] == 12
+    assert counters["max_in_flight"] == max_connections
+
+
+def test_http_error_raises_runtime_warning():
+    stock_list = [Stock("GOOD", "Good", 1), Stock("MISSING", "Missing", 1)]
+    with history_server(synthetic_history_page(5), errors={"MISSING": 503}) as (base_url, counters):
+        with pytest.raises(RuntimeWarning, match="503"):
+            _retrieve(stock_list, base_url)
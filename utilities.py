@@ -1,6 +1,8 @@
 #Helper Functions
 
 import matplotlib.pyplot as plt
+import charts
+from stock_class import find_stock
 
 from os import system, name
 
@@ -11,43 +13,32 @@ def clear_screen():
     else: # User is running Linux or Mac
         _ = system('clear')
 
-# Function to sort the stock list (alphabetical)
+# Function to sort the stock list (alphabetical); a Portfolio is always in this order already
 def sortStocks(stock_list):
     stock_list.sort(key=lambda stock: stock.symbol.upper())
 
 
 # Function to sort the daily stock data (oldest to newest) for all stocks
+# Stock keeps its history in date order as bars are added, so this is only a check;
+# histories that are not loaded yet come from the database already sorted and are left alone.
 def sortDailyData(stock_list):
     for stock in stock_list:
-        stock.DataList.sort(key=lambda data: data.date)
+        if stock.history_loaded:
+            stock.DataList.sort()
 
 
 # Function to create stock chart
-def display_stock_chart(stock_list, symbol):
-    matching_stock = None
-    for stock in stock_list:
-        if stock.symbol.upper() == symbol.upper():
-            matching_stock = stock
-            break
+# start and end (dates, inclusive) limit the chart to part of the history; only those bars are read.
+def display_stock_chart(stock_list, symbol, start=None, end=None):
+    matching_stock = find_stock(stock_list, symbol)
     if not matching_stock:
         print(f"No stock found for symbol {symbol}")
         return
-    if not matching_stock.DataList:
+    if not len(matching_stock.window(start, end)):
         print(f"No historical data to chart for {symbol}")
         return
-    sortDailyData([matching_stock])
-    dates = [data.date for data in matching_stock.DataList]
-    closes = [data.close for data in matching_stock.DataList]
-    volumes = [data.volume for data in matching_stock.DataList]
-    fig, ax_price = plt.subplots()
-    ax_price.plot(dates, closes, marker="o", color="#1f77b4", label="Close Price")
-    ax_price.set_xlabel("Date")
-    ax_price.set_ylabel("Price", color="#1f77b4")
-    ax_price.tick_params(axis="y", labelcolor="#1f77b4")
-    ax_volume = ax_price.twinx()
-    ax_volume.bar(dates, volumes, alpha=0.2, color="#7f7f7f", label="Volume")
-    ax_volume.set_ylabel("Volume", color="#7f7f7f")
-    fig.autofmt_xdate()
-    fig.tight_layout()
-    fig.suptitle(f"{matching_stock.symbol} - Closing Price & Volume", y=1.02)
+    # the chart draws about one point per pixel column and redraws them as the view is zoomed or panned
+    chart = charts.PriceChart(plt.figure(figsize=(10, 5)))
+    chart.set_stock(matching_stock, start, end)
+    chart.figure.autofmt_xdate()
     plt.show()